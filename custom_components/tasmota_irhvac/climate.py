@@ -1,18 +1,29 @@
 """Adds support for generic thermostat units."""
 import json
 import logging
+import os
+import time
 import uuid
+from collections import deque
 import asyncio
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
 from homeassistant.components import mqtt
 from homeassistant.components.climate import ClimateEntity, PLATFORM_SCHEMA
+from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
 from homeassistant.core import callback
-from homeassistant.helpers.event import async_track_state_change
+from homeassistant.helpers import config_per_platform, discovery
+from homeassistant.helpers.reload import async_integration_yaml_config
+from homeassistant.helpers.service import async_extract_entity_ids
 from homeassistant.helpers.restore_state import RestoreEntity
+import homeassistant.util.dt as dt_util
 
 from homeassistant.components.climate.const import (
+    ATTR_FAN_MODE,
+    ATTR_HVAC_MODE,
+    ATTR_SWING_MODE,
+    DOMAIN as CLIMATE_DOMAIN,
     HVAC_MODE_OFF,
     HVAC_MODE_HEAT,
     HVAC_MODE_COOL,
@@ -30,24 +41,37 @@ from homeassistant.components.climate.const import (
     SUPPORT_TARGET_TEMPERATURE,
     SWING_BOTH,
     SWING_HORIZONTAL,
+    SWING_OFF,
     SWING_VERTICAL
 )
 
 from homeassistant.const import (
     ATTR_ENTITY_ID,
     ATTR_TEMPERATURE,
+    CONF_AT,
     CONF_NAME,
+    ENTITY_MATCH_ALL,
     PRECISION_HALVES,
     PRECISION_TENTHS,
     PRECISION_WHOLE,
+    SERVICE_RELOAD,
     STATE_ON,
     STATE_OFF,
-    STATE_UNAVAILABLE
+    WEEKDAYS
 )
 
+from .fleet import FleetState, async_register_websocket_commands
+from .payload import minimize_payload, non_default_fields
+from .runtime import RuntimeCounters
+from .scheduler import IRhvacScheduler
+from .sensor_hub import SensorHub
+from .snapshot import StateSnapshot
+from .telemetry import TELE_HUMIDITY, TELE_TEMPERATURE, TelemetryHub, resolve_path
+
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = 'irhvac'
+PLATFORM = 'tasmota_irhvac'
 VERSION = '1.0.0'
 
 # Custom constants
@@ -143,8 +167,15 @@ CONF_VENDOR = "vendor"
 CONF_PROTOCOL = "protocol"  # Soon to be deprecated
 CONF_COMMAND_TOPIC = "command_topic"
 CONF_STATE_TOPIC = "state_topic"
+CONF_DUPLICATE_WINDOW = "duplicate_window"
+CONF_DIAGNOSTICS_SIZE = "diagnostics_buffer_size"
+CONF_SKIP_IDENTICAL = "skip_identical_for"
+CONF_FULL_PAYLOAD = "send_full_payload"
 CONF_TEMP_SENSOR = "temperature_sensor"
 CONF_HUMIDITY_SENSOR = "humidity_sensor"
+CONF_SENSOR_TOPIC = "sensor_topic"
+CONF_TEMP_PATH = "temperature_path"
+CONF_HUMIDITY_PATH = "humidity_path"
 CONF_MIN_TEMP = "min_temp"
 CONF_MAX_TEMP = "max_temp"
 CONF_TARGET_TEMP = "target_temp"
@@ -167,6 +198,8 @@ CONF_FILTER = "default_filter_mode"
 CONF_CLEAN = "default_clean_mode"
 CONF_BEEP = "default_beep_mode"
 CONF_SLEEP = "default_sleep_mode"
+CONF_SCHEDULE = "schedule"
+CONF_DAYS = "days"
 
 # Platform specific default values
 DEFAULT_NAME = "IR Air Conditioner"
@@ -179,6 +212,14 @@ DEFAULT_INITIAL_SWING_MODE = SWING_BOTH
 DEFAULT_INITIAL_VERTICAL_SWING_POSITION = SWING_AUTO
 DEFAULT_INITIAL_HORIZONTAL_SWING_POSITION = SWING_AUTO
 DEFAULT_PRECISION = 1
+DEFAULT_DUPLICATE_WINDOW = 2
+DEFAULT_DIAGNOSTICS_SIZE = 20
+DEFAULT_SKIP_IDENTICAL = 0
+DEFAULT_DIAGNOSTICS_FILE = 'diagnostics.json'
+# Folder in the config folder the diagnostics are written to, and the key
+# marking a file in it as a dump that may be overwritten
+DIAGNOSTICS_DIR = 'tasmota_irhvac_diagnostics'
+DIAGNOSTICS_MARKER = 'tasmota_irhvac_diagnostics'
 DEFAULT_CONF_QUIET = "off"
 DEFAULT_CONF_TURBO = "off"
 DEFAULT_CONF_ECONO = "off"
@@ -215,6 +256,14 @@ ATTR_FILTERS = 'filters'
 ATTR_CLEAN = 'clean'
 ATTR_BEEP = 'beep'
 ATTR_SLEEP = 'sleep'
+ATTR_SCHEDULE = 'schedule'
+ATTR_INBOUND_RECEIVED = 'inbound_received'
+ATTR_INBOUND_DROPPED = 'inbound_dropped'
+ATTR_INBOUND_DUPLICATES = 'inbound_duplicates'
+ATTR_FILENAME = 'filename'
+ATTR_FORCE = 'force'
+ATTR_OUTBOUND_SENT = 'outbound_sent'
+ATTR_OUTBOUND_SKIPPED = 'outbound_skipped'
 
 # Service names
 SERVICE_SET_VERTICAL_SWING = 'set_swingv'
@@ -227,6 +276,9 @@ SERVICE_FILTERS_MODE = 'set_filters'
 SERVICE_CLEAN_MODE = 'set_clean'
 SERVICE_BEEP_MODE = 'set_beep'
 SERVICE_SLEEP_MODE = 'set_sleep'
+SERVICE_SET_SCHEDULE = 'set_schedule'
+SERVICE_SET_STATE = 'set_state'
+SERVICE_DUMP_DIAGNOSTICS = 'dump_diagnostics'
 
 # Map attributes to properties of the state object
 ATTRIBUTES_IRHVAC = {
@@ -242,6 +294,20 @@ ATTRIBUTES_IRHVAC = {
     ATTR_SLEEP: 'sleep'
 }
 
+# IRHVAC payload field of each attribute
+PAYLOAD_FIELDS = {
+    ATTR_SWINGV: 'SwingV',
+    ATTR_SWINGH: 'SwingH',
+    ATTR_ECONO: 'Econo',
+    ATTR_TURBO: 'Turbo',
+    ATTR_QUIET: 'Quiet',
+    ATTR_LIGHT: 'Light',
+    ATTR_FILTERS: 'Filter',
+    ATTR_CLEAN: 'Clean',
+    ATTR_BEEP: 'Beep',
+    ATTR_SLEEP: 'Sleep'
+}
+
 ON_OFF_LIST = [
     'ON',
     'OFF',
@@ -255,6 +321,106 @@ SUPPORT_FLAGS = (SUPPORT_TARGET_TEMPERATURE | SUPPORT_FAN_MODE)
 
 DATA_KEY = 'tasmota_irhvac.climate'
 
+# Keys of the platform wide data stored in hass.data[DATA_KEY]
+DATA_ENTITIES = 'entities'
+DATA_ADD_ENTITIES = 'add_entities'
+DATA_SCHEDULER = 'scheduler'
+DATA_TELEMETRY = 'telemetry'
+DATA_SENSOR_HUB = 'sensor_hub'
+DATA_SNAPSHOT = 'snapshot'
+DATA_FLEET = 'fleet'
+DATA_ADD_SENSORS = 'add_sensors'
+DATA_LOADED = 'loaded'
+
+# Internal fields kept in the state snapshot, with the supported values a
+# restored value has to be in, either a list or the name of the attribute
+# holding the configured list
+SNAPSHOT_FIELDS = {
+    'hvac_mode': '_hvac_list',
+    'last_on_mode': '_hvac_list',
+    'power_mode': None,
+    'enabled': None,
+    'target_temp': None,
+    'fan_mode': '_fan_list',
+    'swing_mode': '_swing_list',
+    'swingv_position': SWING_VERTICAL_LIST + [SWING_OFF],
+    'swingh_position': SWING_HORIZONTAL_LIST + [SWING_OFF],
+    'quiet': None,
+    'turbo': None,
+    'econo': None,
+    'celsius': None,
+    'light': None,
+    'filters': None,
+    'clean': None,
+    'beep': None,
+    'sleep': None,
+}
+
+SCHEDULE_ENTRY_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_AT): cv.time,
+        vol.Optional(CONF_DAYS, default=WEEKDAYS): vol.All(
+            cv.ensure_list, [vol.In(WEEKDAYS)]
+        ),
+        vol.Optional(ATTR_HVAC_MODE): vol.In(HVAC_MODES),
+        vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+    }
+)
+
+SCHEDULE_SCHEMA = vol.All(cv.ensure_list, [SCHEDULE_ENTRY_SCHEMA])
+
+ON_OFF_SCHEMA = vol.All(cv.string, vol.In(ON_OFF_LIST))
+
+# Flags that map 1:1 to an entity attribute, with the schema of their value
+FLAG_SERVICES = {
+    ATTR_ECONO: (SERVICE_ECONO_MODE, ON_OFF_SCHEMA),
+    ATTR_TURBO: (SERVICE_TURBO_MODE, ON_OFF_SCHEMA),
+    ATTR_QUIET: (SERVICE_QUIET_MODE, ON_OFF_SCHEMA),
+    ATTR_LIGHT: (SERVICE_LIGHT_MODE, ON_OFF_SCHEMA),
+    ATTR_FILTERS: (SERVICE_FILTERS_MODE, ON_OFF_SCHEMA),
+    ATTR_CLEAN: (SERVICE_CLEAN_MODE, ON_OFF_SCHEMA),
+    ATTR_BEEP: (SERVICE_BEEP_MODE, ON_OFF_SCHEMA),
+    ATTR_SLEEP: (SERVICE_SLEEP_MODE, cv.string),
+    ATTR_SWINGV: (SERVICE_SET_VERTICAL_SWING, vol.All(cv.string, vol.Lower, vol.In(SWING_VERTICAL_LIST + [SWING_OFF]))),
+    ATTR_SWINGH: (SERVICE_SET_HORIZONTAL_SWING, vol.All(cv.string, vol.Lower, vol.In(SWING_HORIZONTAL_LIST + [SWING_OFF]))),
+}
+
+SET_STATE_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Optional(ATTR_HVAC_MODE): vol.In(HVAC_MODES),
+        vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+        vol.Optional(ATTR_FAN_MODE): vol.In(HVAC_FAN_LIST),
+        vol.Optional(ATTR_SWING_MODE): vol.In(HVAC_SWING_LIST),
+        vol.Optional(ATTR_FORCE, default=False): cv.boolean,
+        **{
+            vol.Optional(attribute): value_schema
+            for attribute, (_, value_schema) in FLAG_SERVICES.items()
+        },
+    }
+)
+
+def diagnostics_filename(value):
+    """Validate a diagnostics file name and give it the .json suffix."""
+    if value in ('', '.', '..'):
+        raise vol.Invalid("invalid diagnostics file name")
+    if not value.lower().endswith('.json'):
+        value += '.json'
+    return value
+
+
+DUMP_DIAGNOSTICS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.comp_entity_ids,
+        vol.Optional(ATTR_FILENAME, default=DEFAULT_DIAGNOSTICS_FILE): vol.All(
+            cv.string, os.path.basename, diagnostics_filename
+        ),
+    }
+)
+
+SET_SCHEDULE_SCHEMA = cv.make_entity_service_schema(
+    {vol.Required(ATTR_SCHEDULE): vol.Any(None, SCHEDULE_SCHEMA)}
+)
+
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
         vol.Required(CONF_NAME, default=DEFAULT_NAME): cv.string,
@@ -262,9 +428,24 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         vol.Exclusive(CONF_VENDOR, CONF_EXCLUSIVE_GROUP_VENDOR): cv.string,
         vol.Exclusive(CONF_PROTOCOL, CONF_EXCLUSIVE_GROUP_VENDOR): cv.string,
         vol.Required(CONF_COMMAND_TOPIC): mqtt.valid_publish_topic,
-        vol.Required(CONF_STATE_TOPIC): mqtt.valid_subscribe_topic,
+        vol.Required(CONF_STATE_TOPIC): vol.All(
+            cv.ensure_list, [mqtt.valid_subscribe_topic]
+        ),
+        vol.Optional(CONF_DUPLICATE_WINDOW, default=DEFAULT_DUPLICATE_WINDOW): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_DIAGNOSTICS_SIZE, default=DEFAULT_DIAGNOSTICS_SIZE): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_SKIP_IDENTICAL, default=DEFAULT_SKIP_IDENTICAL): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_FULL_PAYLOAD, default=False): cv.boolean,
         vol.Optional(CONF_TEMP_SENSOR): cv.entity_id,
         vol.Optional(CONF_HUMIDITY_SENSOR): cv.entity_id,
+        vol.Optional(CONF_SENSOR_TOPIC): mqtt.valid_subscribe_topic,
+        vol.Optional(CONF_TEMP_PATH): cv.string,
+        vol.Optional(CONF_HUMIDITY_PATH): cv.string,
         vol.Optional(CONF_MIN_TEMP, default=DEFAULT_MIN_TEMP): vol.Coerce(float),
         vol.Optional(CONF_MAX_TEMP, default=DEFAULT_MAX_TEMP): vol.Coerce(float),
         vol.Optional(CONF_TARGET_TEMP, default=DEFAULT_TARGET_TEMP): vol.Coerce(float),
@@ -294,48 +475,234 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         vol.Optional(CONF_FILTER, default=DEFAULT_CONF_FILTER): cv.string,
         vol.Optional(CONF_CLEAN, default=DEFAULT_CONF_CLEAN): cv.string,
         vol.Optional(CONF_BEEP, default=DEFAULT_CONF_BEEP): cv.string,
-        vol.Optional(CONF_SLEEP, default=DEFAULT_CONF_SLEEP): cv.string
+        vol.Optional(CONF_SLEEP, default=DEFAULT_CONF_SLEEP): cv.string,
+        vol.Optional(CONF_SCHEDULE, default=[]): SCHEDULE_SCHEMA
     }
 )
 
+def _fingerprint_value(value):
+    """Return a value as lower case string, with 24, 24.0 and "24" equal."""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return value.lower()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).lower()
+
+
+def payload_fingerprint(payload):
+    """Return a hash of an IRHVAC body that ignores case and value types."""
+    return hash(tuple(sorted(
+        (field, _fingerprint_value(value)) for field, value in payload.items()
+    )))
+
+
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the irhvac platform."""
+    if DATA_KEY not in hass.data:
+        fleet = FleetState(hass)
+        hass.data[DATA_KEY] = {
+            DATA_ENTITIES: [],
+            DATA_ADD_ENTITIES: async_add_entities,
+            DATA_SCHEDULER: IRhvacScheduler(hass),
+            DATA_TELEMETRY: TelemetryHub(hass),
+            DATA_SENSOR_HUB: SensorHub(hass),
+            DATA_SNAPSHOT: StateSnapshot(hass),
+            DATA_FLEET: fleet,
+        }
+        # Created before the first await, every platform entry set up
+        # meanwhile waits for the same load instead of racing it
+        hass.data[DATA_KEY][DATA_LOADED] = hass.async_create_task(
+            async_setup_platform_data(hass)
+        )
+        async_register_websocket_commands(hass, fleet)
+        # sensor is a dependency in the manifest and already set up, so
+        # its config is not needed here
+        hass.async_create_task(
+            discovery.async_load_platform(hass, SENSOR_DOMAIN, PLATFORM, {}, {})
+        )
+
+    await hass.data[DATA_KEY][DATA_LOADED]
     async_add_entities([IRhvac(hass, config)])
 
+
+async def async_setup_platform_data(hass):
+    """Load the stores and register the services once for all entries."""
+    platform_data = hass.data[DATA_KEY]
+    await platform_data[DATA_SCHEDULER].async_load()
+    await platform_data[DATA_SNAPSHOT].async_load()
+
+    async def async_reload_service(service):
+        """Apply the changed platform configuration without a restart."""
+        await async_reload_entities(hass)
+
+    async def async_dump_diagnostics_service(service):
+        """Write the diagnostics of the targeted units to a file."""
+        await async_dump_diagnostics(
+            hass, service.data.get(ATTR_ENTITY_ID), service.data[ATTR_FILENAME]
+        )
+
+    hass.services.async_register(DOMAIN, SERVICE_RELOAD, async_reload_service)
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DUMP_DIAGNOSTICS,
+        async_dump_diagnostics_service,
+        schema=DUMP_DIAGNOSTICS_SCHEMA,
+    )
+    async_register_entity_service(
+        hass, SERVICE_SET_SCHEDULE, SET_SCHEDULE_SCHEMA, 'async_set_schedule'
+    )
+    async_register_entity_service(
+        hass, SERVICE_SET_STATE, SET_STATE_SCHEMA, 'async_set_state'
+    )
+    for attribute, (service_name, value_schema) in FLAG_SERVICES.items():
+        async_register_entity_service(
+            hass,
+            service_name,
+            cv.make_entity_service_schema({vol.Required(attribute): value_schema}),
+            'async_set_' + attribute,
+        )
+
+
+def async_register_entity_service(hass, name, schema, method):
+    """Register a service calling a method on the targeted IRhvac entities.
+
+    Each YAML entry is its own entity platform, so the services dispatch
+    to the entities of all entries instead of going through one platform.
+    """
+
+    async def async_handle_service(service):
+        entity_ids = await async_extract_entity_ids(hass, service)
+        params = {
+            key: value for key, value in service.data.items() if key != ATTR_ENTITY_ID
+        }
+        for entity in list(hass.data[DATA_KEY][DATA_ENTITIES]):
+            if entity.entity_id in entity_ids:
+                await getattr(entity, method)(**params)
+
+    hass.services.async_register(DOMAIN, name, async_handle_service, schema=schema)
+
+
+async def async_dump_diagnostics(hass, entity_ids, filename):
+    """Dump the message buffers and internal state of units to a file.
+
+    The data is collected on the event loop and written by an executor
+    job into DIAGNOSTICS_DIR, all units are dumped when no entity_ids are
+    given. Only earlier dumps are overwritten.
+    """
+    entities = hass.data[DATA_KEY][DATA_ENTITIES]
+    data = {
+        DIAGNOSTICS_MARKER: True,
+        'units': {
+            entity.entity_id: entity.diagnostics()
+            for entity in entities
+            if entity_ids in (None, ENTITY_MATCH_ALL) or entity.entity_id in entity_ids
+        },
+    }
+    directory = hass.config.path(DIAGNOSTICS_DIR)
+    path = os.path.join(directory, filename)
+
+    def write_diagnostics():
+        os.makedirs(directory, exist_ok=True)
+        if os.path.lexists(path):
+            try:
+                with open(path) as diagnostics_file:
+                    previous = json.load(diagnostics_file)
+            except (OSError, ValueError):
+                previous = None
+            if not isinstance(previous, dict) or previous.get(DIAGNOSTICS_MARKER) is not True:
+                return False
+        with open(path, 'w') as diagnostics_file:
+            json.dump(data, diagnostics_file, indent=2, default=str)
+        return True
+
+    if not await hass.async_add_executor_job(write_diagnostics):
+        _LOGGER.error("Not overwriting %s, it is not an earlier diagnostics dump", path)
+        return
+    _LOGGER.info("Diagnostics of %d units written to %s", len(data['units']), path)
+
+
+async def async_reload_entities(hass):
+    """Diff the YAML configuration against the running entities.
+
+    Entities are matched by unique_id. Unchanged entities are left alone,
+    changed ones are updated in place (keeping their current state),
+    removed ones are dropped and new ones are added.
+    """
+    conf = await async_integration_yaml_config(hass, CLIMATE_DOMAIN)
+    if conf is None:
+        return
+
+    new_configs = {}
+    for p_type, p_config in config_per_platform(conf, CLIMATE_DOMAIN):
+        if p_type != PLATFORM:
+            continue
+        unique_id = p_config.get(CONF_UNIQUE_ID)
+        if unique_id is None:
+            _LOGGER.warning(
+                'Skipping "%s" on reload: no unique_id configured', p_config[CONF_NAME]
+            )
+            continue
+        new_configs[unique_id] = p_config
+
+    platform_data = hass.data[DATA_KEY]
+    for entity in list(platform_data[DATA_ENTITIES]):
+        if entity.unique_id is None:
+            continue
+        new_config = new_configs.pop(entity.unique_id, None)
+        if new_config is None:
+            _LOGGER.debug("Removing %s on reload", entity.entity_id)
+            await entity.async_remove()
+            platform_data[DATA_SNAPSHOT].async_remove(entity.unique_id)
+        elif new_config != entity.config:
+            _LOGGER.debug("Updating %s on reload", entity.entity_id)
+            await entity.async_apply_config(new_config)
+
+    if new_configs:
+        platform_data[DATA_ADD_ENTITIES](
+            [IRhvac(hass, new_config) for new_config in new_configs.values()]
+        )
+
 class IRhvac(ClimateEntity, RestoreEntity):
     def __init__(self, hass, config):
         self.hass = hass
-        self._name = config[CONF_NAME]
-        self._unique_id = config[CONF_UNIQUE_ID]
-        self._topic = config[CONF_COMMAND_TOPIC]
-        self._state_topic = config[CONF_STATE_TOPIC]
-        self._vendor = config[CONF_VENDOR]
-        self._protocol = config[CONF_PROTOCOL]
-        self._temperature_sensor = config[CONF_TEMP_SENSOR]
-        self._humidity_sensor = config[CONF_HUMIDITY_SENSOR]
+        self._config = None
+        self._sensor_unsubs = []
+        self._runtime = RuntimeCounters()
+        self.runtime_sensors = []
+        self._inbound_log = deque(maxlen=config[CONF_DIAGNOSTICS_SIZE])
+        self._outbound_log = deque(maxlen=config[CONF_DIAGNOSTICS_SIZE])
         self._current_temperature = None
         self._current_humidity = None
-        self._min_temp = config[CONF_MIN_TEMP]
-        self._max_temp = config[CONF_MAX_TEMP]
         self._target_temp = config[CONF_TARGET_TEMP]
-        self._temp_precision = config[CONF_PRECISION]
-        self._hvac_list = config[CONF_MODE_LIST]
         self._hvac_mode = config[CONF_INITIAL_OPERATION_MODE]
         self._last_on_mode = None
-        self._fan_list = config[CONF_FAN_LIST]
         self._fan_mode = config[CONF_INITIAL_FAN_MODE]
-        self._swing_list = config[CONF_SWING_LIST]
         self._unit = hass.config.units.temperature_unit
         self._quiet = config[CONF_QUIET]
         self._turbo = config[CONF_TURBO]
         self._econo = config[CONF_ECONO]
-        self._model = config[CONF_MODEL]
         self._celsius = config[CONF_CELSIUS]
         self._light = config[CONF_LIGHT]
         self._filters = config[CONF_FILTER]
         self._clean = config[CONF_CLEAN]
         self._beep = config[CONF_BEEP]
         self._sleep = config[CONF_SLEEP]
+        # Payload fields the user set, sent even if the vendor ignores them
+        self._explicit_fields = non_default_fields({
+            'Model': config[CONF_MODEL],
+            'Celsius': self._celsius,
+            'Quiet': self._quiet,
+            'Turbo': self._turbo,
+            'Econo': self._econo,
+            'Light': self._light,
+            'Filter': self._filters,
+            'Clean': self._clean,
+            'Beep': self._beep,
+            'Sleep': self._sleep,
+        })
         self._power_mode = STATE_OFF
         self._enabled = False
 
@@ -343,21 +710,27 @@ class IRhvac(ClimateEntity, RestoreEntity):
         if self._hvac_mode is not HVAC_MODE_OFF:
             self._power_mode = STATE_ON
             self._enabled = True
-        
-        if self._vendor is None:
-            if self._protocol is None:
-                _LOGGER.error('Neither vendor nor protocol provided for "%s"!', self._unique_id)
-                return
-            self._vendor = self._protocol
-            
-        self._support_flags = SUPPORT_FLAGS
+
+        if not self._load_config(config):
+            return
+
         if self._swing_list:
-            self._support_flags = self.support_flags | SUPPORT_SWING_MODE
             self._swing_mode = config[CONF_INITIAL_SWING_MODE]
             self._swingv_position = config[CONF_INITIAL_VERTICAL_SWING_POSITION]
             self._swingh_position = config[CONF_INITIAL_HORIZONTAL_SWING_POSITION]
         
         self._sub_state = None
+        self._pending_payload = None
+        self._drain_scheduled = False
+        self._inbound_received = 0
+        self._inbound_dropped = 0
+        self._inbound_duplicates = 0
+        self._last_payload_key = None
+        self._last_payload_at = None
+        self._confirmed_fingerprint = None
+        self._confirmed_at = None
+        self._outbound_sent = 0
+        self._outbound_skipped = 0
         self._state_attrs = {}
         self._state_attrs.update(
             {attribute: getattr(self, '_' + attribute)
@@ -365,160 +738,465 @@ class IRhvac(ClimateEntity, RestoreEntity):
         )
         
         self._temp_lock = asyncio.Lock()
+
+    def _load_config(self, config):
+        """Load the settings that can change on reload.
+
+        The initial_* and default_* values only seed the state of a new
+        entity, so they are not reapplied here. A config without vendor and
+        protocol is rejected before anything is changed.
+        """
+        vendor = config.get(CONF_VENDOR)
+        if vendor is None:
+            vendor = config.get(CONF_PROTOCOL)
+        if vendor is None:
+            _LOGGER.error(
+                'Neither vendor nor protocol provided for "%s"!',
+                config.get(CONF_UNIQUE_ID, config[CONF_NAME])
+            )
+            return False
+
+        self._config = config
+        self._name = config[CONF_NAME]
+        self._unique_id = config.get(CONF_UNIQUE_ID)
+        self._topic = config[CONF_COMMAND_TOPIC]
+        self._state_topics = config[CONF_STATE_TOPIC]
+        self._duplicate_window = config[CONF_DUPLICATE_WINDOW]
+        self._skip_identical_for = config[CONF_SKIP_IDENTICAL]
+        self._full_payload = config[CONF_FULL_PAYLOAD]
+        self._vendor = vendor
+        self._protocol = config.get(CONF_PROTOCOL)
+        self._temperature_sensor = config.get(CONF_TEMP_SENSOR)
+        self._humidity_sensor = config.get(CONF_HUMIDITY_SENSOR)
+        self._sensor_topic = config.get(CONF_SENSOR_TOPIC)
+        self._temperature_path = config.get(CONF_TEMP_PATH)
+        self._humidity_path = config.get(CONF_HUMIDITY_PATH)
+        self._min_temp = config[CONF_MIN_TEMP]
+        self._max_temp = config[CONF_MAX_TEMP]
+        self._temp_precision = config[CONF_PRECISION]
+        self._hvac_list = config[CONF_MODE_LIST]
+        self._fan_list = config[CONF_FAN_LIST]
+        self._swing_list = config[CONF_SWING_LIST]
+        self._model = config[CONF_MODEL]
+        self._vendor_marker = json.dumps(self._vendor)
+
+        self._support_flags = SUPPORT_FLAGS
+        if self._swing_list:
+            self._support_flags = self._support_flags | SUPPORT_SWING_MODE
+        return True
+
+    async def async_apply_config(self, config):
+        """Apply a changed configuration while keeping the current state."""
+        old_sensors = self._sensor_settings
+        had_swing = bool(self._swing_list)
+        if not self._load_config(config):
+            return
+
+        if self._swing_list and not had_swing:
+            self._swing_mode = config[CONF_INITIAL_SWING_MODE]
+            self._swingv_position = config[CONF_INITIAL_VERTICAL_SWING_POSITION]
+            self._swingh_position = config[CONF_INITIAL_HORIZONTAL_SWING_POSITION]
+        if self._hvac_mode not in self._hvac_list:
+            _LOGGER.warning(
+                "Current HVAC mode %s of %s is no longer supported",
+                self._hvac_mode, self.entity_id
+            )
+
+        size = config[CONF_DIAGNOSTICS_SIZE]
+        if size != self._inbound_log.maxlen:
+            self._inbound_log = deque(self._inbound_log, maxlen=size)
+            self._outbound_log = deque(self._outbound_log, maxlen=size)
+        if old_sensors != self._sensor_settings:
+            await self._async_track_sensors()
+        self._update_schedule()
+        await self._subscribe_topics()
+        await self.async_update_ha_state()
+
+    @property
+    def config(self):
+        """Return the platform configuration the entity was built from."""
+        return self._config
+
+    @property
+    def runtime(self):
+        """Return the runtime and duty cycle counters."""
+        return self._runtime
+
+    @property
+    def _sensor_settings(self):
+        """Return the settings that decide where readings come from."""
+        return (
+            self._temperature_sensor,
+            self._humidity_sensor,
+            self._sensor_topic,
+            self._temperature_path,
+            self._humidity_path,
+        )
               
     async def async_added_to_hass(self):
         """Run when entity about to be added."""
         await super().async_added_to_hass()
         
-        if self._temperature_sensor is not None:
-            async_track_state_change(
-                self.hass, self._temperature_sensor, self._async_temperature_sensor_changed
-            )
-            sensor_state = self.hass.states.get(self._temperature_sensor)
-            if sensor_state and sensor_state.state != STATE_UNAVAILABLE:
-                self._async_update_temperature(sensor_state)
-
-        if self._humidity_sensor is not None:
-            async_track_state_change(
-                self.hass, self._humidity_sensor, self._async_humidity_sensor_changed
-            )
-            sensor_state = self.hass.states.get(self._humidity_sensor)
-            if sensor_state and sensor_state.state != STATE_UNAVAILABLE:
-                self._async_update_humidity(sensor_state)
+        self.hass.data[DATA_KEY][DATA_ENTITIES].append(self)
+        add_sensors = self.hass.data[DATA_KEY].get(DATA_ADD_SENSORS)
+        if add_sensors is not None:
+            add_sensors(self)
+        await self._async_track_sensors()
         
         await self._subscribe_topics()
 
 #         self.hass.bus.async_listen_once(
 #             EVENT_HOMEASSISTANT_START, _async_startup)
 
-        # Check If we have an old state
-        last_state = await self.async_get_last_state()
-        if last_state is not None:
-            self._hvac_mode = last_state.state
-            self._fan_mode = last_state.attributes[ATTR_FAN_MODE]
-            self._target_temp = last_state.attributes[ATTR_TEMPERATURE]
-            if self._swing_list:
-                self._swing_mode = last_state.attributes['swing_mode']
-                self._swingv_position = last_state.attributes['swingv']
-                self._swingh_position = last_state.attributes['swingh']
-
-            if self._hvac_mode != HVAC_MODE_OFF:
-                self._last_on_mode = self._hvac_mode
-                self._power_mode = STATE_ON
-                self._enabled = True
-            else:
-                self._power_mode = STATE_OFF
-                self._enabled = False
+        # Check If we have an old state, the snapshot also holds the
+        # fields that are not exposed as attributes
+        snapshot = self.hass.data[DATA_KEY][DATA_SNAPSHOT].get(self._unique_id)
+        if snapshot is not None:
+            self._restore_snapshot(snapshot)
+        else:
+            last_state = await self.async_get_last_state()
+            if last_state is not None:
+                self._restore_last_state(last_state)
 
-    async def _subscribe_topics(self):
-        """(Re)Subscribe to topics."""
+        self._update_schedule()
 
-        @callback
-        def state_message_received(msg):
-            """Handle new MQTT state messages."""
-            json_payload = json.loads(msg.payload)
-            _LOGGER.debug("Payload received: %s", json_payload)
+    def _restore_last_state(self, last_state):
+        """Restore from the state machine, for units without a snapshot."""
+        self._hvac_mode = last_state.state
+        self._fan_mode = last_state.attributes.get(ATTR_FAN_MODE, self._fan_mode)
+        self._target_temp = last_state.attributes.get(ATTR_TEMPERATURE, self._target_temp)
+        if self._swing_list:
+            self._swing_mode = last_state.attributes.get(ATTR_SWING_MODE, self._swing_mode)
+            self._swingv_position = last_state.attributes.get(ATTR_SWINGV, self._swingv_position)
+            self._swingh_position = last_state.attributes.get(ATTR_SWINGH, self._swingh_position)
 
-            # If listening to `tele`, result looks like: {"IrReceived":{"Protocol":"XXX", ... ,"IRHVAC":{ ... }}}
-            # we want to extract the data.
-            if "IrReceived" in json_payload:
-                json_payload = json_payload["IrReceived"]
+        if self._hvac_mode != HVAC_MODE_OFF:
+            self._last_on_mode = self._hvac_mode
+            self._power_mode = STATE_ON
+            self._enabled = True
+        else:
+            self._power_mode = STATE_OFF
+            self._enabled = False
 
-            # By now the payload must include an `IRHVAC` field.
-            if "IRHVAC" not in json_payload:
-                return
+    def _restore_snapshot(self, snapshot):
+        """Restore the fields of a snapshot that still fit the config.
 
-            payload = json_payload["IRHVAC"]
-
-            if payload["Vendor"] == self._vendor:
-                # All values in the payload are Optional
-                if "Power" in payload:
-                    self._power_mode = payload["Power"].lower()
-                if "Mode" in payload:
-                    self._hvac_mode = payload["Mode"].lower()
-                if "Temp" in payload:
-                    if payload["Temp"] > 0:
-                        self._target_temp = payload["Temp"]
-                if "Celsius" in payload:
-                    self._celsius = payload["Celsius"].lower()
-                if "Quiet" in payload:
-                    self._quiet = payload["Quiet"].lower()
-                if "Turbo" in payload:
-                    self._turbo = payload["Turbo"].lower()
-                if "Econo" in payload:
-                    self._econo = payload["Econo"].lower()
-                if "Light" in payload:
-                    self._light = payload["Light"].lower()
-                if "Filter" in payload:
-                    self._filters = payload["Filter"].lower()
-                if "Clean" in payload:
-                    self._clean = payload["Clean"].lower()
-                if "Beep" in payload:
-                    self._beep = payload["Beep"].lower()
-                if "Sleep" in payload:
-                    self._sleep = payload["Sleep"]
-                self._swingv_position = SWING_OFF
-                self._swingh_position = SWING_OFF
-                if "SwingV" in payload and (SWING_VERTICAL in self._swing_list or SWING_BOTH in self._swing_list):
-                    self._swingv_position = payload["SwingV"].lower()
-                if "SwingH" in payload and (SWING_HORIZONTAL in self._swing_list or SWING_BOTH in self._swing_list):
-                    self._swingh_position = payload["SwingH"].lower()
-                if self._swingv_position is not None and self._swingv_position == SWING_AUTO:
-                    if self._swingh_position is not None and self._swingh_position == SWING_AUTO:
-                        self._swing_mode = SWING_BOTH
-                    else:
-                        self._swing_mode = SWING_VERTICAL
-                elif self._swingh_position is not None and self._swingh_position == SWING_AUTO:
-                    self._swing_mode = SWING_HORIZONTAL
-                else:
-                    self._swing_mode = SWING_OFF
-
-                if "FanSpeed" in payload:
-                    fan_mode = payload["FanSpeed"].lower()
-                    # ELECTRA_AC fan modes fix
-                    if (
-                        HVAC_FAN_MAX_HIGH in self._fan_list
-                        and HVAC_FAN_AUTO_MAX in self._fan_list
-                    ):
-                        if fan_mode == HVAC_FAN_MAX:
-                            self._fan_mode = FAN_HIGH
-                        elif fan_mode == HVAC_FAN_AUTO:
-                            self._fan_mode = HVAC_FAN_MAX
-                        else:
-                            self._fan_mode = fan_mode
-                    else:
-                        self._fan_mode = fan_mode
-                    _LOGGER.debug("Fan Mode: %s", self._fan_mode)
+        Unknown fields are ignored and missing, no longer supported or out
+        of range ones keep their configured default.
+        """
+        for field, supported in SNAPSHOT_FIELDS.items():
+            if field not in snapshot:
+                continue
+            value = snapshot[field]
+            if isinstance(supported, str):
+                supported = getattr(self, supported)
+            if supported is not None and value is not None and value not in supported:
+                continue
+            if field == 'target_temp' and value is not None and not (
+                isinstance(value, (int, float))
+                and self._min_temp <= value <= self._max_temp
+            ):
+                continue
+            setattr(self, '_' + field, value)
+        self._runtime.restore(snapshot.get('runtime'))
+        explicit_fields = snapshot.get('explicit_fields')
+        if isinstance(explicit_fields, list):
+            self._explicit_fields.update(
+                field for field in explicit_fields if field in PAYLOAD_FIELDS.values()
+            )
+        self._state_attrs.update(
+            {attribute: getattr(self, '_' + attribute)
+             for attribute in ATTRIBUTES_IRHVAC}
+        )
 
-                # Set default state to off
-                if self._power_mode == STATE_OFF:
-                    self._enabled = False
-                    self._hvac_mode = HVAC_MODE_OFF
-                else:
-                    self._enabled = True
+    @callback
+    def async_write_ha_state(self):
+        """Write the state and refresh the snapshot and fleet state."""
+        self._async_publish_state()
+        super().async_write_ha_state()
+
+    async def async_update_ha_state(self, force_refresh=False):
+        """Update the state and refresh the snapshot and fleet state."""
+        self._async_publish_state()
+        await super().async_update_ha_state(force_refresh)
+
+    @callback
+    def _async_publish_state(self):
+        if self.hass is None:
+            return
+        platform_data = self.hass.data[DATA_KEY]
+        self._runtime.transition(
+            STATE_OFF if self._power_mode == STATE_OFF else self._hvac_mode
+        )
+        snapshot = {field: getattr(self, '_' + field, None) for field in SNAPSHOT_FIELDS}
+        snapshot['runtime'] = self._runtime.as_dict()
+        snapshot['explicit_fields'] = sorted(self._explicit_fields)
+        platform_data[DATA_SNAPSHOT].async_update(self._unique_id, snapshot)
+        if self.entity_id is not None:
+            platform_data[DATA_FLEET].async_update(
+                self.entity_id,
+                (
+                    self._hvac_mode,
+                    self._target_temp,
+                    self._current_temperature,
+                    self._fan_mode,
+                    self._power_mode,
+                ),
+            )
+
+    async def _async_track_sensors(self):
+        """(Re)Track the temperature and humidity sensors."""
+        while self._sensor_unsubs:
+            self._sensor_unsubs.pop()()
 
-                # Update state attributes
-                self._state_attrs.update(
-                    {attribute: getattr(self, '_' + attribute)
-                     for attribute in ATTRIBUTES_IRHVAC}
+        sensor_hub = self.hass.data[DATA_KEY][DATA_SENSOR_HUB]
+        if self._temperature_sensor is not None:
+            self._sensor_unsubs.append(sensor_hub.async_add_listener(
+                self._temperature_sensor, self._async_update_temperature, self.async_write_ha_state
+            ))
+
+        if self._humidity_sensor is not None:
+            self._sensor_unsubs.append(sensor_hub.async_add_listener(
+                self._humidity_sensor, self._async_update_humidity, self.async_write_ha_state
+            ))
+
+        if self._sensor_topic is not None:
+            self._sensor_unsubs.append(
+                await self.hass.data[DATA_KEY][DATA_TELEMETRY].async_add_listener(
+                    self._sensor_topic, self._sensor_telemetry_received
                 )
-                # Update HA UI and State
-                self.schedule_update_ha_state()
+            )
+
+    @callback
+    def _sensor_telemetry_received(self, data):
+        """Update temperature and humidity from the bridge's own sensor."""
+        changed = False
+        for key, path, attr in (
+            (TELE_TEMPERATURE, self._temperature_path, '_current_temperature'),
+            (TELE_HUMIDITY, self._humidity_path, '_current_humidity'),
+        ):
+            value = resolve_path(data, path, key)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError) as ex:
+                _LOGGER.debug("Unable to update from sensor telemetry: %s", ex)
+                continue
+            if getattr(self, attr) != value:
+                setattr(self, attr, value)
+                changed = True
+        if changed:
+            self.async_write_ha_state()
+
+    async def _subscribe_topics(self):
+        """(Re)Subscribe to topics."""
+
+        @callback
+        def state_message_received(msg):
+            """Handle new MQTT state messages.
+
+            Only the latest message is kept until the next loop iteration,
+            superseded ones are dropped before they are decoded. Frames
+            that can't be IRHVAC states of this vendor (other remotes,
+            other ACs on the same bridge) never take the slot.
+            """
+            self._inbound_log.append((time.time(), msg.topic, msg.payload))
+            if not self._may_be_own_state(msg.payload):
+                return
+            self._inbound_received += 1
+            if self._pending_payload is not None:
+                self._inbound_dropped += 1
+            self._pending_payload = msg.payload
+            if not self._drain_scheduled:
+                self._drain_scheduled = True
+                self.hass.loop.call_soon(self._drain_state_messages)
 
         self._sub_state = await mqtt.subscription.async_subscribe_topics(
             self.hass,
             self._sub_state,
             {
-                CONF_STATE_TOPIC: {
-                    "topic": self._state_topic,
+                "{}_{}".format(CONF_STATE_TOPIC, index): {
+                    "topic": topic,
                     "msg_callback": state_message_received,
                     "qos": 1,
                 }
+                for index, topic in enumerate(self._state_topics)
             },
         )
 
+    def _may_be_own_state(self, raw_payload):
+        """Cheaply check a raw frame for an IRHVAC body of our vendor."""
+        if isinstance(raw_payload, bytes):
+            return b'"IRHVAC"' in raw_payload and self._vendor_marker.encode() in raw_payload
+        return '"IRHVAC"' in raw_payload and self._vendor_marker in raw_payload
+
+    @callback
+    def _drain_state_messages(self):
+        """Process the latest pending MQTT state message."""
+        self._drain_scheduled = False
+        raw_payload, self._pending_payload = self._pending_payload, None
+        if raw_payload is None or self.hass is None:
+            return
+        self._process_state_message(raw_payload)
+
+    @callback
+    def _process_state_message(self, raw_payload):
+        """Decode and apply a MQTT state message."""
+        json_payload = json.loads(raw_payload)
+        _LOGGER.debug("Payload received: %s", json_payload)
+
+        # If listening to `tele`, result looks like: {"IrReceived":{"Protocol":"XXX", ... ,"IRHVAC":{ ... }}}
+        # we want to extract the data.
+        if "IrReceived" in json_payload:
+            json_payload = json_payload["IrReceived"]
+
+        # By now the payload must include an `IRHVAC` field.
+        if "IRHVAC" not in json_payload:
+            return
+
+        payload = json_payload["IRHVAC"]
+
+        if payload["Vendor"] == self._vendor and self._is_duplicate(payload):
+            self._inbound_duplicates += 1
+            return
+
+        if payload["Vendor"] == self._vendor:
+            # All values in the payload are Optional
+            if "Power" in payload:
+                self._power_mode = payload["Power"].lower()
+            if "Mode" in payload:
+                self._hvac_mode = payload["Mode"].lower()
+            if "Temp" in payload:
+                if payload["Temp"] > 0:
+                    self._target_temp = payload["Temp"]
+            if "Celsius" in payload:
+                self._celsius = payload["Celsius"].lower()
+            if "Quiet" in payload:
+                self._quiet = payload["Quiet"].lower()
+            if "Turbo" in payload:
+                self._turbo = payload["Turbo"].lower()
+            if "Econo" in payload:
+                self._econo = payload["Econo"].lower()
+            if "Light" in payload:
+                self._light = payload["Light"].lower()
+            if "Filter" in payload:
+                self._filters = payload["Filter"].lower()
+            if "Clean" in payload:
+                self._clean = payload["Clean"].lower()
+            if "Beep" in payload:
+                self._beep = payload["Beep"].lower()
+            if "Sleep" in payload:
+                self._sleep = payload["Sleep"]
+            self._swingv_position = SWING_OFF
+            self._swingh_position = SWING_OFF
+            if "SwingV" in payload and (SWING_VERTICAL in self._swing_list or SWING_BOTH in self._swing_list):
+                self._swingv_position = payload["SwingV"].lower()
+            if "SwingH" in payload and (SWING_HORIZONTAL in self._swing_list or SWING_BOTH in self._swing_list):
+                self._swingh_position = payload["SwingH"].lower()
+            if self._swingv_position is not None and self._swingv_position == SWING_AUTO:
+                if self._swingh_position is not None and self._swingh_position == SWING_AUTO:
+                    self._swing_mode = SWING_BOTH
+                else:
+                    self._swing_mode = SWING_VERTICAL
+            elif self._swingh_position is not None and self._swingh_position == SWING_AUTO:
+                self._swing_mode = SWING_HORIZONTAL
+            else:
+                self._swing_mode = SWING_OFF
+
+            if "FanSpeed" in payload:
+                fan_mode = payload["FanSpeed"].lower()
+                # ELECTRA_AC fan modes fix
+                if (
+                    HVAC_FAN_MAX_HIGH in self._fan_list
+                    and HVAC_FAN_AUTO_MAX in self._fan_list
+                ):
+                    if fan_mode == HVAC_FAN_MAX:
+                        self._fan_mode = FAN_HIGH
+                    elif fan_mode == HVAC_FAN_AUTO:
+                        self._fan_mode = HVAC_FAN_MAX
+                    else:
+                        self._fan_mode = fan_mode
+                else:
+                    self._fan_mode = fan_mode
+                _LOGGER.debug("Fan Mode: %s", self._fan_mode)
+
+            # Set default state to off
+            if self._power_mode == STATE_OFF:
+                self._enabled = False
+                self._hvac_mode = HVAC_MODE_OFF
+            else:
+                self._enabled = True
+
+            # The unit reported this state, sending it again is redundant
+            self._confirmed_fingerprint = payload_fingerprint(self._build_payload())
+            self._confirmed_at = time.monotonic()
+            self._last_payload_key = payload_fingerprint(payload)
+            self._last_payload_at = self._confirmed_at
+
+            # Update state attributes
+            self._state_attrs.update(
+                {attribute: getattr(self, '_' + attribute)
+                 for attribute in ATTRIBUTES_IRHVAC}
+            )
+            self._state_attrs[ATTR_INBOUND_RECEIVED] = self._inbound_received
+            self._state_attrs[ATTR_INBOUND_DROPPED] = self._inbound_dropped
+            self._state_attrs[ATTR_INBOUND_DUPLICATES] = self._inbound_duplicates
+            # Update HA UI and State
+            self.async_write_ha_state()
+
+    def diagnostics(self):
+        """Return the recent raw messages and the internal state."""
+        return {
+            'unique_id': self._unique_id,
+            'vendor': self._vendor,
+            'command_topic': self._topic,
+            'state_topics': self._state_topics,
+            'state': {field: getattr(self, '_' + field, None) for field in SNAPSHOT_FIELDS},
+            'current_temperature': self._current_temperature,
+            'current_humidity': self._current_humidity,
+            'counters': {
+                ATTR_INBOUND_RECEIVED: self._inbound_received,
+                ATTR_INBOUND_DROPPED: self._inbound_dropped,
+                ATTR_INBOUND_DUPLICATES: self._inbound_duplicates,
+                ATTR_OUTBOUND_SENT: self._outbound_sent,
+                ATTR_OUTBOUND_SKIPPED: self._outbound_skipped,
+            },
+            'inbound': [
+                {'time': dt_util.utc_from_timestamp(at).isoformat(), 'topic': topic, 'payload': payload}
+                for at, topic, payload in list(self._inbound_log)
+            ],
+            'outbound': [
+                {'time': dt_util.utc_from_timestamp(at).isoformat(), 'topic': topic, 'payload': payload}
+                for at, topic, payload in list(self._outbound_log)
+            ],
+        }
+
+    def _is_duplicate(self, payload):
+        """Return True if payload repeats the last applied body within the window.
+
+        With both stat and tele topics subscribed, every own command comes
+        back twice, the second copy is dropped here. Only the last applied
+        body is compared and a published command forgets it, so going back
+        to an earlier state is still applied.
+        """
+        if not self._duplicate_window or self._last_payload_key is None:
+            return False
+        if time.monotonic() - self._last_payload_at >= self._duplicate_window:
+            return False
+        return payload_fingerprint(payload) == self._last_payload_key
+
     async def async_will_remove_from_hass(self):
         """Unsubscribe when removed."""
+        entities = self.hass.data[DATA_KEY][DATA_ENTITIES]
+        if self in entities:
+            entities.remove(self)
+        while self._sensor_unsubs:
+            self._sensor_unsubs.pop()()
+        self.hass.data[DATA_KEY][DATA_SCHEDULER].async_remove_entity(self)
+        self.hass.data[DATA_KEY][DATA_FLEET].async_remove(self.entity_id)
+        while self.runtime_sensors:
+            await self.runtime_sensors.pop().async_remove()
         self._sub_state = await mqtt.subscription.async_unsubscribe_topics(
             self.hass, self._sub_state
         )
@@ -646,17 +1324,21 @@ class IRhvac(ClimateEntity, RestoreEntity):
         if hvac_mode not in self._hvac_list:
             _LOGGER.error("Unsupported HVAC mode: %s", hvac_mode)
             return
+        self._set_hvac_mode(hvac_mode)
+        
+        # Ensure we update the current operation after changing the mode
+        await self.async_send_cmd(False)
+
+    def _set_hvac_mode(self, hvac_mode):
+        """Set hvac mode and the matching power state, without sending it."""
         self._hvac_mode = hvac_mode
         if hvac_mode == HVAC_MODE_OFF:
             self._enabled = False
-            self.power_mode = STATE_OFF
+            self._power_mode = STATE_OFF
         else:
             self._last_on_mode = hvac_mode
             self._enabled = True
-            self.power_mode = STATE_ON
-        
-        # Ensure we update the current operation after changing the mode
-        await self.async_send_cmd(False)
+            self._power_mode = STATE_ON
 
     async def async_turn_on(self):
         """Turn thermostat on."""
@@ -674,17 +1356,23 @@ class IRhvac(ClimateEntity, RestoreEntity):
         temperature = kwargs.get(ATTR_TEMPERATURE)
         if temperature is None:
             return
+        if not self._set_target_temp(temperature):
+            return
+        if self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(False)
+
+    def _set_target_temp(self, temperature):
+        """Validate and round a new target temperature, without sending it."""
         if temperature < self._min_temp or temperature > self._max_temp:
             _LOGGER.warning('The temperature value is out of range')
-            return
-        if self._precision == PRECISION_WHOLE:
+            return False
+        if self._temp_precision == PRECISION_WHOLE:
             self._target_temp = round(temperature)
-        elif self._precision == PRECISION_HALVES:
+        elif self._temp_precision == PRECISION_HALVES:
             self._target_temp = round(temperature * 2) / 2
         else: # default to 1 decimal place
             self._target_temp = round(temperature, 1)
-        if self._hvac_mode != HVAC_MODE_OFF:
-            await self.async_send_cmd(False)
+        return True
 
     async def async_set_fan_mode(self, fan_mode):
         """Set new target fan mode."""
@@ -707,6 +1395,7 @@ class IRhvac(ClimateEntity, RestoreEntity):
             _LOGGER.error(self._swing_list)
             return
         self._swing_mode = swing_mode
+        self._explicit_fields.update(('SwingV', 'SwingH'))
         if self._hvac_mode != HVAC_MODE_OFF:
             await self.async_send_cmd(True)
 
@@ -715,6 +1404,7 @@ class IRhvac(ClimateEntity, RestoreEntity):
         if econo not in ON_OFF_LIST:
             return
         self._econo = econo.lower()
+        self._explicit_fields.add('Econo')
         if self._hvac_mode != HVAC_MODE_OFF:
             await self.async_send_cmd(True)
 
@@ -723,6 +1413,7 @@ class IRhvac(ClimateEntity, RestoreEntity):
         if turbo not in ON_OFF_LIST:
             return
         self._turbo = turbo.lower()
+        self._explicit_fields.add('Turbo')
         if self._hvac_mode != HVAC_MODE_OFF:
             await self.async_send_cmd(True)
 
@@ -731,6 +1422,7 @@ class IRhvac(ClimateEntity, RestoreEntity):
         if quiet not in ON_OFF_LIST:
             return
         self._quiet = quiet.lower()
+        self._explicit_fields.add('Quiet')
         if self._hvac_mode != HVAC_MODE_OFF:
             await self.async_send_cmd(True)
 
@@ -739,59 +1431,223 @@ class IRhvac(ClimateEntity, RestoreEntity):
         if clean not in ON_OFF_LIST:
             return
         self._clean = clean.lower()
+        self._explicit_fields.add('Clean')
         if self._hvac_mode != HVAC_MODE_OFF:
             await self.async_send_cmd(True)
 
     async def async_set_sleep(self, sleep):
         """Set new target sleep mode."""
         self._sleep = sleep.lower()
+        self._explicit_fields.add('Sleep')
+        if self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(True)
+
+    async def async_set_light(self, light):
+        """Set new target light mode."""
+        if light not in ON_OFF_LIST:
+            return
+        self._light = light.lower()
+        self._explicit_fields.add('Light')
         if self._hvac_mode != HVAC_MODE_OFF:
             await self.async_send_cmd(True)
 
-    async def async_send_cmd(self, attr_update=False):
+    async def async_set_filters(self, filters):
+        """Set new target filters mode."""
+        if filters not in ON_OFF_LIST:
+            return
+        self._filters = filters.lower()
+        self._explicit_fields.add('Filter')
+        if self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(True)
+
+    async def async_set_beep(self, beep):
+        """Set new target beep mode."""
+        if beep not in ON_OFF_LIST:
+            return
+        self._beep = beep.lower()
+        self._explicit_fields.add('Beep')
+        if self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(True)
+
+    async def async_set_swingv(self, swingv):
+        """Set new vertical swing position."""
+        self._swingv_position = swingv.lower()
+        self._explicit_fields.add('SwingV')
+        if self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(True)
+
+    async def async_set_swingh(self, swingh):
+        """Set new horizontal swing position."""
+        self._swingh_position = swingh.lower()
+        self._explicit_fields.add('SwingH')
+        if self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(True)
+
+    async def async_set_state(self, **kwargs):
+        """Set any combination of settings with a single IR command.
+
+        All values are validated first, nothing is changed if one of them
+        is not supported.
+        """
+        hvac_mode = kwargs.get(ATTR_HVAC_MODE)
+        temperature = kwargs.get(ATTR_TEMPERATURE)
+        fan_mode = kwargs.get(ATTR_FAN_MODE)
+        swing_mode = kwargs.get(ATTR_SWING_MODE)
+        if hvac_mode is not None and hvac_mode not in self._hvac_list:
+            _LOGGER.error("Unsupported HVAC mode: %s", hvac_mode)
+            return
+        if temperature is not None and (
+            temperature < self._min_temp or temperature > self._max_temp
+        ):
+            _LOGGER.warning('The temperature value is out of range')
+            return
+        if fan_mode is not None and fan_mode not in self._fan_list:
+            _LOGGER.error("Unsupported fan mode: %s", fan_mode)
+            return
+        if swing_mode is not None and swing_mode not in self._swing_list:
+            _LOGGER.error("Unsupported swing mode: %s", swing_mode)
+            return
+
+        if temperature is not None:
+            self._set_target_temp(temperature)
+        if fan_mode is not None:
+            self._fan_mode = fan_mode
+        if swing_mode is not None:
+            self._swing_mode = swing_mode
+            self._explicit_fields.update(('SwingV', 'SwingH'))
+        if kwargs.get(ATTR_SWINGV) is not None:
+            self._swingv_position = kwargs[ATTR_SWINGV].lower()
+        if kwargs.get(ATTR_SWINGH) is not None:
+            self._swingh_position = kwargs[ATTR_SWINGH].lower()
+        for attribute in ATTRIBUTES_IRHVAC:
+            if kwargs.get(attribute) is None:
+                continue
+            self._explicit_fields.add(PAYLOAD_FIELDS[attribute])
+            if attribute not in (ATTR_SWINGV, ATTR_SWINGH):
+                setattr(self, '_' + attribute, kwargs[attribute].lower())
+        if hvac_mode is not None:
+            self._set_hvac_mode(hvac_mode)
+
+        if hvac_mode is not None or self._hvac_mode != HVAC_MODE_OFF:
+            await self.async_send_cmd(True, force=kwargs.get(ATTR_FORCE, False))
+        else:
+            await self.async_update_state_attrs()
+            await self.async_update_ha_state()
+
+    async def async_set_schedule(self, schedule):
+        """Replace the schedule, None falls back to the configured one."""
+        for entry in schedule or []:
+            error = self._schedule_entry_error(entry)
+            if error is not None:
+                _LOGGER.error("Schedule of %s not changed: %s", self.entity_id, error)
+                return
+        scheduler = self.hass.data[DATA_KEY][DATA_SCHEDULER]
+        if self._unique_id is None:
+            _LOGGER.warning(
+                "%s has no unique_id, its schedule will not survive a restart",
+                self.entity_id
+            )
+        scheduler.async_persist(self._unique_id, schedule)
+        self._update_schedule(schedule)
+
+    def _schedule_entry_error(self, entry):
+        """Return why async_set_state would reject an entry, None if it fits."""
+        hvac_mode = entry.get(ATTR_HVAC_MODE)
+        if hvac_mode is not None and hvac_mode not in self._hvac_list:
+            return "unsupported HVAC mode {} at {}".format(hvac_mode, entry[CONF_AT])
+        temperature = entry.get(ATTR_TEMPERATURE)
+        if temperature is not None and not self._min_temp <= temperature <= self._max_temp:
+            return "temperature {} at {} is out of range".format(temperature, entry[CONF_AT])
+        return None
+
+    def _update_schedule(self, schedule=None):
+        """Hand the active schedule over to the shared scheduler.
+
+        Entries the unit does not support, e.g. after a config change, are
+        left out with a warning instead of failing every time they are due.
+        """
+        scheduler = self.hass.data[DATA_KEY][DATA_SCHEDULER]
+        if schedule is None:
+            stored = scheduler.stored_schedule(self._unique_id)
+            if stored is not None:
+                try:
+                    schedule = SCHEDULE_SCHEMA(stored)
+                except vol.Invalid as ex:
+                    _LOGGER.warning("Ignoring stored schedule of %s: %s", self.entity_id, ex)
+        if schedule is None:
+            schedule = self._config[CONF_SCHEDULE]
+        entries = []
+        for entry in schedule:
+            error = self._schedule_entry_error(entry)
+            if error is None:
+                entries.append(entry)
+            else:
+                _LOGGER.warning("Ignoring schedule entry of %s: %s", self.entity_id, error)
+        scheduler.async_set_schedule(self, entries)
+
+    async def async_send_cmd(self, attr_update=False, force=False):
         if attr_update:
             await self.async_update_state_attrs()
-        await self.hass.async_add_executor_job(self.send_ir)
+        payload_data = self._build_payload()
+        if not force and self._is_confirmed(payload_data):
+            _LOGGER.debug("Skipping already confirmed payload for %s", self.entity_id)
+            self._outbound_skipped += 1
+        else:
+            if payload_fingerprint(payload_data) != self._confirmed_fingerprint:
+                # The unit is told something else now, the old confirmation
+                # no longer tells what state it is in
+                self._confirmed_fingerprint = None
+                self._confirmed_at = None
+            self._last_payload_key = None
+            self._outbound_sent += 1
+            self._runtime.command_sent()
+            await self.hass.async_add_executor_job(self.send_ir, payload_data)
+        self._state_attrs[ATTR_OUTBOUND_SENT] = self._outbound_sent
+        self._state_attrs[ATTR_OUTBOUND_SKIPPED] = self._outbound_skipped
         await self.async_update_ha_state()
 
+    def _is_confirmed(self, payload_data):
+        """Return True if the unit recently reported this exact state."""
+        if not self._skip_identical_for or self._confirmed_at is None:
+            return False
+        if time.monotonic() - self._confirmed_at >= self._skip_identical_for:
+            return False
+        return payload_fingerprint(payload_data) == self._confirmed_fingerprint
+
     async def async_update_state_attrs(self):
         self._state_attrs.update(
             {attribute: getattr(self, '_' + attribute)
              for attribute in ATTRIBUTES_IRHVAC}
         )
 
-    async def _async_temperature_sensor_changed(self, entity_id, old_state, new_state):
-        """Handle temperature changes."""
-        if new_state is not None:
-            self._async_update_temperature(new_state)
-            await self.async_update_ha_state()
-
     @callback
-    def _async_update_temperature(self, state):
-        """Update thermostat with latest state from temperature sensor."""
-        try:
-            if state.state != STATE_UNAVAILABLE:
-                self._current_temperature = float(state.state)
-        except ValueError as ex:
-            _LOGGER.debug("Unable to update from temperature sensor: %s", ex)
-
-    async def _async_humidity_sensor_changed(self, entity_id, old_state, new_state):
-        """Handle humidity changes."""
-        if new_state is not None:
-            self._async_update_humidity(new_state)
-            await self.async_update_ha_state()
+    def _async_update_temperature(self, temperature):
+        """Update thermostat with latest reading of the temperature sensor."""
+        if temperature == self._current_temperature:
+            return False
+        self._current_temperature = temperature
+        return True
 
     @callback
-    def _async_update_humidity(self, state):
-        """Update thermostat with latest state from humidity sensor."""
-        try:
-            if state.state != STATE_UNAVAILABLE:
-                self._current_humidity = float(state.state)
-        except ValueError as ex:
-            _LOGGER.debug("Unable to update from humidity sensor: %s", ex)
+    def _async_update_humidity(self, humidity):
+        """Update thermostat with latest reading of the humidity sensor."""
+        if humidity == self._current_humidity:
+            return False
+        self._current_humidity = humidity
+        return True
             
-    def send_ir(self):
+    def send_ir(self, payload_data=None):
         """Send the payload to tasmota mqtt topic."""
+        if payload_data is None:
+            payload_data = self._build_payload()
+        payload = (json.dumps(payload_data))
+        _LOGGER.debug("Payload to publish: %s", payload)
+        self._outbound_log.append((time.time(), self._topic, payload))
+        # Publish mqtt message
+        mqtt.async_publish(self.hass, self._topic, payload)
+
+    def _build_payload(self):
+        """Build the IRHVAC payload for the current state."""
         # Set the vertical and horizontal swing positions, default to 'auto'
         swing_v = SWING_AUTO
         swing_h = SWING_AUTO
@@ -816,10 +1672,13 @@ class IRhvac(ClimateEntity, RestoreEntity):
             "Quiet": self._quiet,
             "Turbo": self._turbo,
             "Econo": self._econo,
+            "Light": self._light,
+            "Filter": self._filters,
             "Clean": self._clean,
+            "Beep": self._beep,
             "Sleep": self._sleep
         }
-        payload = (json.dumps(payload_data))
-        _LOGGER.debug("Payload to publish: %s", payload)
-        # Publish mqtt message
-        mqtt.async_publish(self.hass, self._topic, payload)
+        if self._full_payload:
+            return payload_data
+        # Leave out what the vendor ignores, constrained devices parse less
+        return minimize_payload(payload_data, self._explicit_fields)
@@ -0,0 +1,119 @@
+"""Columnar snapshot of all IRhvac units for dashboards."""
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+
+WS_TYPE_FLEET = 'irhvac/fleet'
+WS_TYPE_FLEET_SUBSCRIBE = 'irhvac/fleet/subscribe'
+
+# Columns of the snapshot, in the order of a row
+FLEET_COLUMNS = ('hvac_mode', 'target_temp', 'current_temperature', 'fan_mode', 'power')
+
+
+class FleetState:
+    """Keep one row per unit and push the changed columns to subscribers.
+
+    Changes made during one loop iteration are sent together, so the
+    traffic scales with the number of changes and not with the number
+    of units.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._rows = {}
+        self._subscribers = []
+        self._pending = {}
+        self._removed = set()
+        self._flush_scheduled = False
+
+    def snapshot(self):
+        """Return all units as entity ids and one list per column."""
+        entity_ids = list(self._rows)
+        data = {'entity_ids': entity_ids}
+        for index, column in enumerate(FLEET_COLUMNS):
+            data[column] = [self._rows[entity_id][index] for entity_id in entity_ids]
+        return data
+
+    @callback
+    def async_update(self, entity_id, row):
+        """Record the current row of a unit."""
+        row = tuple(row)
+        old_row = self._rows.get(entity_id)
+        if old_row == row:
+            return
+        self._rows[entity_id] = row
+        self._removed.discard(entity_id)
+        if not self._subscribers:
+            return
+        changes = self._pending.setdefault(entity_id, {})
+        for index, column in enumerate(FLEET_COLUMNS):
+            if old_row is None or old_row[index] != row[index]:
+                changes[column] = row[index]
+        self._schedule_flush()
+
+    @callback
+    def async_remove(self, entity_id):
+        """Drop a removed unit."""
+        if self._rows.pop(entity_id, None) is None:
+            return
+        self._pending.pop(entity_id, None)
+        if self._subscribers:
+            self._removed.add(entity_id)
+            self._schedule_flush()
+
+    @callback
+    def async_subscribe(self, listener):
+        """Call listener with the deltas, returns the unsubscribe callable."""
+        self._subscribers.append(listener)
+
+        @callback
+        def unsubscribe():
+            if listener in self._subscribers:
+                self._subscribers.remove(listener)
+
+        return unsubscribe
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.hass.loop.call_soon(self._flush)
+
+    @callback
+    def _flush(self):
+        self._flush_scheduled = False
+        if not self._pending and not self._removed:
+            return
+        delta = {'changed': self._pending}
+        if self._removed:
+            delta['removed'] = sorted(self._removed)
+        self._pending = {}
+        self._removed = set()
+        for listener in list(self._subscribers):
+            listener(delta)
+
+
+@callback
+def async_register_websocket_commands(hass, fleet):
+    """Register the fleet snapshot and subscription commands."""
+
+    @websocket_api.websocket_command({vol.Required('type'): WS_TYPE_FLEET})
+    @callback
+    def websocket_fleet(hass, connection, msg):
+        """Return the snapshot of all units."""
+        connection.send_result(msg['id'], fleet.snapshot())
+
+    @websocket_api.websocket_command({vol.Required('type'): WS_TYPE_FLEET_SUBSCRIBE})
+    @callback
+    def websocket_fleet_subscribe(hass, connection, msg):
+        """Return the snapshot of all units and push the deltas after."""
+
+        @callback
+        def forward_delta(delta):
+            connection.send_message(websocket_api.event_message(msg['id'], delta))
+
+        connection.subscriptions[msg['id']] = fleet.async_subscribe(forward_delta)
+        connection.send_result(msg['id'], fleet.snapshot())
+
+    websocket_api.async_register_command(hass, websocket_fleet)
+    websocket_api.async_register_command(hass, websocket_fleet_subscribe)
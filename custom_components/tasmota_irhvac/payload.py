@@ -0,0 +1,71 @@
+"""Per vendor trimming of the IRHVAC payload sent to Tasmota."""
+
+# Fields sent to every vendor
+BASE_FIELDS = ("Vendor", "Power", "Mode", "Temp", "FanSpeed")
+
+# Additional fields the IRremoteESP8266 IRac implementation of a protocol
+# actually uses, everything else is ignored by the device.
+VENDOR_FIELDS = {
+    "COOLIX": ("SwingV", "SwingH", "Turbo", "Light", "Clean", "Sleep"),
+    "DAIKIN": ("SwingV", "SwingH", "Quiet", "Turbo", "Econo", "Clean"),
+    "DAIKIN2": ("SwingV", "SwingH", "Quiet", "Turbo", "Econo", "Light", "Filter", "Clean", "Beep", "Sleep"),
+    "ELECTRA_AC": ("SwingV", "SwingH", "Turbo", "Light", "Clean"),
+    "FUJITSU_AC": ("Model", "Celsius", "SwingV", "SwingH", "Quiet", "Turbo", "Econo", "Filter", "Clean"),
+    "GREE": ("Model", "Celsius", "SwingV", "Turbo", "Econo", "Light", "Clean", "Sleep"),
+    "HAIER_AC": ("SwingV", "Filter", "Sleep"),
+    "HITACHI_AC": ("SwingV", "SwingH"),
+    "KELVINATOR": ("Celsius", "SwingV", "SwingH", "Quiet", "Turbo", "Light", "Filter", "Clean"),
+    "LG": ("Model",),
+    "MIDEA": ("Celsius", "SwingV", "Quiet", "Turbo", "Econo", "Light", "Clean", "Sleep"),
+    "MITSUBISHI_AC": ("SwingV", "SwingH", "Quiet", "Econo"),
+    "PANASONIC_AC": ("Model", "SwingV", "SwingH", "Quiet", "Turbo"),
+    "SAMSUNG_AC": ("SwingV", "SwingH", "Quiet", "Turbo", "Light", "Filter", "Clean", "Beep"),
+    "TCL112AC": ("SwingV", "SwingH", "Turbo", "Econo", "Light", "Filter"),
+    "TOSHIBA_AC": (),
+}
+
+# Values the Tasmota IRHVAC parser assumes for fields missing from a command
+TASMOTA_DEFAULTS = {
+    "Model": "-1",
+    "Celsius": "on",
+    "SwingV": "off",
+    "SwingH": "off",
+    "Quiet": "off",
+    "Turbo": "off",
+    "Econo": "off",
+    "Light": "off",
+    "Filter": "off",
+    "Clean": "off",
+    "Beep": "off",
+    "Sleep": "-1",
+}
+
+
+_ALWAYS_SENT = {
+    vendor: frozenset(BASE_FIELDS + fields) for vendor, fields in VENDOR_FIELDS.items()
+}
+
+
+def non_default_fields(values):
+    """Return the fields whose value differs from the Tasmota default."""
+    return {
+        field for field, value in values.items()
+        if field in TASMOTA_DEFAULTS and str(value).lower() != TASMOTA_DEFAULTS[field]
+    }
+
+
+def minimize_payload(payload, explicit=()):
+    """Drop the fields a vendor ignores from an IRHVAC payload.
+
+    The base fields and the fields of the vendor profile are always sent,
+    other fields only when they are in explicit, i.e. were set by the
+    user. Unknown vendors get the full payload.
+    """
+    always_sent = _ALWAYS_SENT.get(payload.get("Vendor"))
+    if always_sent is None:
+        return payload
+    return {
+        field: value
+        for field, value in payload.items()
+        if field in always_sent or field in explicit
+    }
@@ -0,0 +1,131 @@
+"""Runtime and duty cycle counters kept in memory per IRhvac unit."""
+import time
+from collections import deque
+
+from homeassistant.const import STATE_OFF
+import homeassistant.util.dt as dt_util
+
+# Window of the rolling duty cycle in seconds
+DUTY_CYCLE_WINDOW = 24 * 60 * 60
+
+
+def _local_day(timestamp):
+    return dt_util.as_local(dt_util.utc_from_timestamp(timestamp)).date().isoformat()
+
+
+class RuntimeCounters:
+    """Count on-time per mode, IR commands and cycles incrementally.
+
+    Everything is updated on mode transitions only, reading a counter
+    never scans any history.
+    """
+
+    def __init__(self):
+        self.on_time = {}
+        self.ir_commands = 0
+        self._cycles = 0
+        self._day = None
+        self._mode = None
+        self._since = None
+        self._intervals = deque()
+        self._intervals_total = 0.0
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call listener when a counter changed, returns the remove callable."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            listener()
+
+    def transition(self, mode, now=None):
+        """Record the mode of the unit, STATE_OFF when it is powered off."""
+        if mode == self._mode:
+            return
+        now = time.time() if now is None else now
+        was_on = self._mode not in (None, STATE_OFF)
+        if was_on:
+            duration = now - self._since
+            self.on_time[self._mode] = self.on_time.get(self._mode, 0.0) + duration
+            self._intervals.append((self._since, now))
+            self._intervals_total += duration
+        elif mode != STATE_OFF and self._mode is not None:
+            self._roll_day(now)
+            self._cycles += 1
+        self._mode = mode
+        self._since = now
+        self._notify()
+
+    def command_sent(self):
+        """Count an IR command."""
+        self.ir_commands += 1
+        self._notify()
+
+    def _roll_day(self, now):
+        day = _local_day(now)
+        if day != self._day:
+            self._day = day
+            self._cycles = 0
+
+    def cycles_today(self, now=None):
+        """Return the number of off to on transitions today."""
+        self._roll_day(time.time() if now is None else now)
+        return self._cycles
+
+    def total_on_time(self, now=None):
+        """Return on-time per mode in seconds, including the running one."""
+        totals = dict(self.on_time)
+        if self._mode not in (None, STATE_OFF):
+            now = time.time() if now is None else now
+            totals[self._mode] = totals.get(self._mode, 0.0) + now - self._since
+        return totals
+
+    def duty_cycle(self, now=None):
+        """Return the share of the last DUTY_CYCLE_WINDOW the unit was on, in %."""
+        now = time.time() if now is None else now
+        start = now - DUTY_CYCLE_WINDOW
+        while self._intervals and self._intervals[0][1] <= start:
+            begin, end = self._intervals.popleft()
+            self._intervals_total -= end - begin
+        on_time = self._intervals_total
+        if self._intervals and self._intervals[0][0] < start:
+            on_time -= start - self._intervals[0][0]
+        if self._mode not in (None, STATE_OFF):
+            on_time += now - max(self._since, start)
+        return round(100 * max(on_time, 0.0) / DUTY_CYCLE_WINDOW, 1)
+
+    def as_dict(self):
+        """Return the counters in a JSON serialisable form."""
+        return {
+            'on_time': self.on_time,
+            'ir_commands': self.ir_commands,
+            'cycles': self._cycles,
+            'day': self._day,
+            'mode': self._mode,
+            'intervals': list(self._intervals),
+        }
+
+    def restore(self, data, now=None):
+        """Restore the counters saved by as_dict.
+
+        The running segment restarts at restore time, the time Home
+        Assistant was down is not counted.
+        """
+        if not isinstance(data, dict):
+            return
+        now = time.time() if now is None else now
+        try:
+            self.on_time = {mode: float(value) for mode, value in data.get('on_time', {}).items()}
+            self.ir_commands = int(data.get('ir_commands', 0))
+            self._cycles = int(data.get('cycles', 0))
+            self._day = data.get('day')
+            self._intervals = deque(
+                (float(begin), float(end)) for begin, end in data.get('intervals', [])
+            )
+        except (AttributeError, TypeError, ValueError):
+            return
+        self._intervals_total = sum(end - begin for begin, end in self._intervals)
+        self._mode = data.get('mode')
+        self._since = now
@@ -0,0 +1,170 @@
+"""Setpoint and mode schedules shared by all Tasmota IRHVAC units."""
+import heapq
+import itertools
+import logging
+from datetime import timedelta
+
+from homeassistant.const import WEEKDAYS
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = 'tasmota_irhvac.schedules'
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+# Keys of a single schedule entry
+SCHEDULE_AT = 'at'
+SCHEDULE_DAYS = 'days'
+SCHEDULE_HVAC_MODE = 'hvac_mode'
+SCHEDULE_TEMPERATURE = 'temperature'
+
+
+def next_occurrence(entry, now):
+    """Return the next local datetime (after now) an entry is due."""
+    at = entry[SCHEDULE_AT]
+    days = entry[SCHEDULE_DAYS]
+    candidate = now.replace(
+        hour=at.hour, minute=at.minute, second=at.second, microsecond=0
+    )
+    for offset in range(8):
+        when = candidate + timedelta(days=offset)
+        if when > now and WEEKDAYS[when.weekday()] in days:
+            return when
+    return None
+
+
+class IRhvacScheduler:
+    """Drive the schedules of all IRhvac entities from one timer.
+
+    Upcoming events of every entity live in a single heap. Changing the
+    schedule of one entity bumps its generation, which invalidates its
+    old heap entries lazily, and pushes only that entity's new events.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._stored = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._entities = {}
+        self._schedules = {}
+        self._generations = {}
+        self._unsub_timer = None
+        self._timer_at = None
+
+    async def async_load(self):
+        """Load the schedules set at runtime from storage."""
+        self._stored = await self._store.async_load() or {}
+
+    def stored_schedule(self, unique_id):
+        """Return the persisted schedule of an entity, if any."""
+        if unique_id is None:
+            return None
+        return self._stored.get(unique_id)
+
+    @callback
+    def async_persist(self, unique_id, schedule):
+        """Persist a schedule set at runtime, None clears it."""
+        if unique_id is None:
+            return
+        if schedule is None:
+            self._stored.pop(unique_id, None)
+        else:
+            self._stored[unique_id] = [
+                {**entry, SCHEDULE_AT: entry[SCHEDULE_AT].isoformat()}
+                for entry in schedule
+            ]
+        self._store.async_delay_save(lambda: self._stored, SAVE_DELAY)
+
+    @callback
+    def async_set_schedule(self, entity, schedule):
+        """(Re)Compute the upcoming events of a single entity."""
+        key = id(entity)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        if not schedule:
+            self._entities.pop(key, None)
+            self._schedules.pop(key, None)
+            return
+        self._entities[key] = entity
+        self._schedules[key] = schedule
+        now = dt_util.now()
+        for index in range(len(schedule)):
+            self._push(key, index, now)
+        self._async_arm_timer()
+
+    @callback
+    def async_remove_entity(self, entity):
+        """Forget the schedule of a removed entity."""
+        self.async_set_schedule(entity, None)
+
+    @callback
+    def _async_cancel_timer(self):
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    def _push(self, key, index, now):
+        when = next_occurrence(self._schedules[key][index], now)
+        if when is None:
+            return
+        heapq.heappush(
+            self._heap,
+            (dt_util.as_utc(when), next(self._seq), key, self._generations[key], index),
+        )
+
+    def _is_current(self, item):
+        _, _, key, generation, _ = item
+        return self._generations.get(key) == generation
+
+    @callback
+    def _async_arm_timer(self):
+        """Point the single timer at the earliest valid event."""
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._async_cancel_timer()
+            self._timer_at = None
+            return
+        when = self._heap[0][0]
+        if when == self._timer_at and self._unsub_timer is not None:
+            return
+        self._async_cancel_timer()
+        self._timer_at = when
+        self._unsub_timer = async_track_point_in_utc_time(
+            self.hass, self._async_timer_fired, when
+        )
+
+    async def _async_timer_fired(self, now):
+        """Apply all due events, one command per entity."""
+        self._unsub_timer = None
+        self._timer_at = None
+        now = dt_util.utcnow()
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            if not self._is_current(item):
+                continue
+            _, _, key, _, index = item
+            changes = due.setdefault(key, {})
+            entry = self._schedules[key][index]
+            for field in (SCHEDULE_HVAC_MODE, SCHEDULE_TEMPERATURE):
+                if entry.get(field) is not None:
+                    changes[field] = entry[field]
+            self._push(key, index, dt_util.as_local(now))
+
+        self._async_arm_timer()
+
+        for key, changes in due.items():
+            entity = self._entities.get(key)
+            if entity is None:
+                continue
+            _LOGGER.debug("Applying schedule to %s: %s", entity.entity_id, changes)
+            try:
+                await entity.async_set_state(**changes)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error applying schedule to %s", entity.entity_id)
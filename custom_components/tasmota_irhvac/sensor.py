@@ -0,0 +1,111 @@
+"""Runtime and duty cycle sensors of the Tasmota IRHVAC units."""
+from datetime import timedelta
+
+from homeassistant.const import PERCENTAGE, TIME_HOURS
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity
+
+from .climate import DATA_ADD_SENSORS, DATA_ENTITIES, DATA_KEY
+
+# Transitions are pushed, polling follows the running segment and the new day
+SCAN_INTERVAL = timedelta(minutes=1)
+
+SENSOR_ON_TIME = 'on_time'
+SENSOR_IR_COMMANDS = 'ir_commands'
+SENSOR_CYCLES_TODAY = 'cycles_today'
+SENSOR_DUTY_CYCLE = 'duty_cycle'
+
+# Sensor type: (name suffix, unit, icon)
+SENSOR_TYPES = {
+    SENSOR_ON_TIME: ('On Time', TIME_HOURS, 'mdi:timer-outline'),
+    SENSOR_IR_COMMANDS: ('IR Commands', None, 'mdi:remote'),
+    SENSOR_CYCLES_TODAY: ('Cycles Today', None, 'mdi:sync'),
+    SENSOR_DUTY_CYCLE: ('Duty Cycle', PERCENTAGE, 'mdi:percent'),
+}
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the runtime sensors, loaded by the climate platform."""
+    if discovery_info is None:
+        return
+
+    @callback
+    def async_add_runtime_sensors(climate):
+        """Add the sensors of one climate entity."""
+        sensors = [IRhvacRuntimeSensor(climate, sensor_type) for sensor_type in SENSOR_TYPES]
+        climate.runtime_sensors.extend(sensors)
+        async_add_entities(sensors)
+
+    platform_data = hass.data[DATA_KEY]
+    platform_data[DATA_ADD_SENSORS] = async_add_runtime_sensors
+    for climate in platform_data[DATA_ENTITIES]:
+        async_add_runtime_sensors(climate)
+
+
+class IRhvacRuntimeSensor(Entity):
+    """A counter of an IRhvac unit."""
+
+    def __init__(self, climate, sensor_type):
+        self._climate = climate
+        self._type = sensor_type
+        self._name, self._unit, self._icon = SENSOR_TYPES[sensor_type]
+        self._unsub = None
+
+    async def async_added_to_hass(self):
+        """Follow the counters of the unit."""
+        self._unsub = self._climate.runtime.add_listener(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self):
+        """Stop following the counters."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @property
+    def should_poll(self):
+        """Poll the running times and the daily count, the rest is pushed."""
+        return self._type != SENSOR_IR_COMMANDS
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return "{} {}".format(self._climate.name, self._name)
+
+    @property
+    def unique_id(self):
+        """Return the unique_id of the sensor."""
+        if self._climate.unique_id is None:
+            return None
+        return "{}_{}".format(self._climate.unique_id, self._type)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return self._unit
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return self._icon
+
+    @property
+    def state(self):
+        """Return the counter value."""
+        runtime = self._climate.runtime
+        if self._type == SENSOR_ON_TIME:
+            return round(sum(runtime.total_on_time().values()) / 3600, 2)
+        if self._type == SENSOR_IR_COMMANDS:
+            return runtime.ir_commands
+        if self._type == SENSOR_CYCLES_TODAY:
+            return runtime.cycles_today()
+        return runtime.duty_cycle()
+
+    @property
+    def device_state_attributes(self):
+        """Return the on-time per mode in hours."""
+        if self._type != SENSOR_ON_TIME:
+            return None
+        return {
+            mode: round(seconds / 3600, 2)
+            for mode, seconds in self._climate.runtime.total_on_time().items()
+        }
@@ -0,0 +1,78 @@
+"""Shared tracking of the temperature and humidity sensor entities."""
+import logging
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_sensor_state(state):
+    """Return the reading of a sensor state as float, None if there is none."""
+    if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None
+    try:
+        return float(state.state)
+    except ValueError as ex:
+        _LOGGER.debug("Unable to update from sensor %s: %s", state.entity_id, ex)
+        return None
+
+
+class SensorHub:
+    """Track every sensor entity once and fan its readings out.
+
+    Units sharing a room sensor share one filtered state change listener,
+    each reading is parsed once and every affected unit writes its state
+    once.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._listeners = {}
+        self._unsubs = {}
+
+    @callback
+    def async_add_listener(self, entity_id, update, write):
+        """Follow the readings of a sensor entity.
+
+        update(value) applies a reading and returns True if it changed
+        anything, write() is then called once for that unit. The current
+        reading is applied right away, without a write. Returns a callable
+        that removes the listener again.
+        """
+        listener = (update, write)
+        self._listeners.setdefault(entity_id, []).append(listener)
+        if entity_id not in self._unsubs:
+            self._unsubs[entity_id] = async_track_state_change_event(
+                self.hass, [entity_id], self._async_state_changed
+            )
+        value = parse_sensor_state(self.hass.states.get(entity_id))
+        if value is not None:
+            update(value)
+
+        @callback
+        def remove_listener():
+            listeners = self._listeners.get(entity_id, [])
+            if listener in listeners:
+                listeners.remove(listener)
+            if not listeners:
+                self._listeners.pop(entity_id, None)
+                unsub = self._unsubs.pop(entity_id, None)
+                if unsub is not None:
+                    unsub()
+
+        return remove_listener
+
+    @callback
+    def _async_state_changed(self, event):
+        """Parse a new reading once and update all units using it."""
+        value = parse_sensor_state(event.data.get('new_state'))
+        if value is None:
+            return
+        writes = []
+        for update, write in list(self._listeners.get(event.data['entity_id'], [])):
+            if update(value) and write not in writes:
+                writes.append(write)
+        for write in writes:
+            write()
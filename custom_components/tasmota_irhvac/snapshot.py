@@ -0,0 +1,46 @@
+"""Compact on-disk snapshot of the internal state of all IRhvac entities."""
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+STORAGE_KEY = 'tasmota_irhvac.snapshot'
+STORAGE_VERSION = 1
+SAVE_DELAY = 5
+
+
+class StateSnapshot:
+    """Keep the state of every unit in one debounced storage file.
+
+    The whole file is read once at platform setup, so restoring any number
+    of units costs a single read.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data = {}
+
+    async def async_load(self):
+        """Load the snapshot of all units."""
+        data = await self._store.async_load()
+        self._data = data if isinstance(data, dict) else {}
+
+    def get(self, unique_id):
+        """Return the saved state of a unit, if any."""
+        if unique_id is None:
+            return None
+        state = self._data.get(unique_id)
+        return state if isinstance(state, dict) else None
+
+    @callback
+    def async_update(self, unique_id, state):
+        """Schedule a save if the state of a unit changed."""
+        if unique_id is None or self._data.get(unique_id) == state:
+            return
+        self._data[unique_id] = state
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    @callback
+    def async_remove(self, unique_id):
+        """Forget a unit that was removed from the configuration."""
+        if self._data.pop(unique_id, None) is not None:
+            self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
@@ -0,0 +1,92 @@
+"""Shared subscriptions to the SENSOR telemetry of Tasmota IR bridges."""
+import json
+import logging
+
+from homeassistant.components import mqtt
+from homeassistant.core import callback
+
+_LOGGER = logging.getLogger(__name__)
+
+# Keys used by Tasmota for the readings of a sensor
+TELE_TEMPERATURE = "Temperature"
+TELE_HUMIDITY = "Humidity"
+
+
+def resolve_path(data, path, key):
+    """Return the reading at a dotted JSON path.
+
+    Without a path, the reading is taken from the first sensor reporting
+    the given key, e.g. {"DHT11": {"Temperature": 22.1}}.
+    """
+    if path is None:
+        for value in data.values():
+            if isinstance(value, dict) and key in value:
+                return value[key]
+        return None
+    value = data
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+class TelemetryHub:
+    """Subscribe once per SENSOR topic and fan the readings out.
+
+    Every entity listening to the same bridge shares the subscription,
+    and each message is decoded only once.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._listeners = {}
+        self._unsubs = {}
+
+    async def async_add_listener(self, topic, listener):
+        """Call listener with the decoded payload of every message on topic.
+
+        Returns a callable that removes the listener again.
+        """
+        self._listeners.setdefault(topic, []).append(listener)
+        if topic not in self._unsubs:
+            self._unsubs[topic] = None
+            self._unsubs[topic] = await mqtt.async_subscribe(
+                self.hass, topic, self._message_callback(topic), 0
+            )
+            if not self._listeners.get(topic):
+                self._async_unsubscribe(topic)
+
+        @callback
+        def remove_listener():
+            listeners = self._listeners.get(topic, [])
+            if listener in listeners:
+                listeners.remove(listener)
+            if not listeners:
+                self._listeners.pop(topic, None)
+                self._async_unsubscribe(topic)
+
+        return remove_listener
+
+    @callback
+    def _async_unsubscribe(self, topic):
+        unsub = self._unsubs.get(topic)
+        if unsub is not None:
+            del self._unsubs[topic]
+            unsub()
+
+    def _message_callback(self, topic):
+        @callback
+        def message_received(msg):
+            """Decode a SENSOR message and pass it to all listeners."""
+            try:
+                data = json.loads(msg.payload)
+            except ValueError as ex:
+                _LOGGER.debug("Unable to decode telemetry on %s: %s", topic, ex)
+                return
+            if not isinstance(data, dict):
+                return
+            for listener in list(self._listeners.get(topic, [])):
+                listener(data)
+
+        return message_received
@@ -0,0 +1,375 @@
+"""Virtual Tasmota IR bridges for local end-to-end load tests.
+
+Runs N virtual Tasmota devices on an in-process MQTT stand-in, or on a
+local MQTT broker when paho-mqtt is installed. Every device accepts IRHVAC
+JSON on cmnd/<device>/irhvac, stays busy for a vendor specific transmit
+time and then answers on stat/<device>/RESULT and tele/<device>/RESULT in
+the same shape a real device does. Drops, duplicates and LWT flaps can be
+injected.
+
+Point the tasmota_irhvac platform at the simulated topics and run e.g.:
+
+    python tools/irhvac_simulator.py --mqtt localhost --devices 100 --serve
+
+or, without Home Assistant, measure the simulator round trip in process:
+
+    python tools/irhvac_simulator.py --devices 100 --commands 20 --drop 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+# Approximate IR transmit time per vendor in seconds, the frame length of
+# these protocols is 100-250ms and some send it twice.
+TRANSMIT_TIME = {
+    "COOLIX": 0.20,
+    "DAIKIN": 0.40,
+    "ELECTRA_AC": 0.12,
+    "FUJITSU_AC": 0.13,
+    "GREE": 0.15,
+    "HITACHI_AC": 0.20,
+    "LG": 0.06,
+    "MIDEA": 0.20,
+    "MITSUBISHI_AC": 0.30,
+    "PANASONIC_AC": 0.25,
+    "SAMSUNG_AC": 0.20,
+    "TOSHIBA_AC": 0.25,
+}
+DEFAULT_TRANSMIT_TIME = 0.15
+
+# Fields reported back in an IRHVAC result, with the value used when a
+# command does not set them.
+IRHVAC_FIELDS = {
+    "Vendor": "Unknown",
+    "Model": -1,
+    "Power": "Off",
+    "Mode": "Off",
+    "Celsius": "On",
+    "Temp": 25,
+    "FanSpeed": "Auto",
+    "SwingV": "Off",
+    "SwingH": "Off",
+    "Quiet": "Off",
+    "Turbo": "Off",
+    "Econo": "Off",
+    "Light": "Off",
+    "Filter": "Off",
+    "Clean": "Off",
+    "Beep": "Off",
+    "Sleep": -1,
+}
+
+
+def topic_matches(subscription, topic):
+    """Return True if an MQTT topic matches a subscription with wildcards."""
+    sub_parts = subscription.split('/')
+    topic_parts = topic.split('/')
+    for index, part in enumerate(sub_parts):
+        if part == '#':
+            return True
+        if index >= len(topic_parts):
+            return False
+        if part != '+' and part != topic_parts[index]:
+            return False
+    return len(sub_parts) == len(topic_parts)
+
+
+class InProcessBroker:
+    """Minimal MQTT stand-in delivering messages on the running loop."""
+
+    def __init__(self):
+        self._subscriptions = []
+        self.published = 0
+
+    def subscribe(self, topic, callback):
+        """Call callback(topic, payload) for every matching message."""
+        entry = (topic, callback)
+        self._subscriptions.append(entry)
+        return lambda: self._subscriptions.remove(entry)
+
+    def publish(self, topic, payload, retain=False):
+        """Deliver a message to all matching subscribers."""
+        self.published += 1
+        loop = asyncio.get_event_loop()
+        for subscription, callback in list(self._subscriptions):
+            if topic_matches(subscription, topic):
+                loop.call_soon(callback, topic, payload)
+
+
+class PahoBroker:
+    """Adapter running the simulator against a real MQTT broker."""
+
+    def __init__(self, host, port=1883):
+        import paho.mqtt.client as paho  # pylint: disable=import-outside-toplevel
+
+        self._loop = asyncio.get_event_loop()
+        self._subscriptions = []
+        self.published = 0
+        self._client = paho.Client()
+        self._client.on_message = self._on_message
+        self._client.connect(host, port)
+        self._client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        payload = msg.payload.decode()
+        for subscription, callback in list(self._subscriptions):
+            if topic_matches(subscription, msg.topic):
+                self._loop.call_soon_threadsafe(callback, msg.topic, payload)
+
+    def subscribe(self, topic, callback):
+        """Call callback(topic, payload) for every matching message."""
+        entry = (topic, callback)
+        self._subscriptions.append(entry)
+        self._client.subscribe(topic, 1)
+
+        def unsubscribe():
+            self._subscriptions.remove(entry)
+            self._client.unsubscribe(topic)
+
+        return unsubscribe
+
+    def publish(self, topic, payload, retain=False):
+        """Publish a message on the broker."""
+        self.published += 1
+        self._client.publish(topic, payload, 1, retain)
+
+    def close(self):
+        """Disconnect from the broker."""
+        self._client.loop_stop()
+        self._client.disconnect()
+
+
+class VirtualTasmota:
+    """A Tasmota IR bridge answering IRHVAC commands."""
+
+    def __init__(self, broker, name, vendor="FUJITSU_AC", rng=None,
+                 drop_rate=0.0, duplicate_rate=0.0):
+        self.broker = broker
+        self.name = name
+        self.vendor = vendor
+        self.online = True
+        self.busy = False
+        self.state = dict(IRHVAC_FIELDS, Vendor=vendor)
+        self.stats = {"received": 0, "sent": 0, "dropped": 0, "duplicated": 0, "offline": 0}
+        self._rng = rng or random.Random()
+        self._drop_rate = drop_rate
+        self._duplicate_rate = duplicate_rate
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self._unsub = None
+
+    @property
+    def command_topic(self):
+        """Return the topic the device takes IRHVAC commands on."""
+        return "cmnd/{}/irhvac".format(self.name)
+
+    def start(self):
+        """Go online and start processing commands."""
+        self._unsub = self.broker.subscribe(self.command_topic, self._command_received)
+        self._worker = asyncio.ensure_future(self._run())
+        self.set_online(True)
+
+    async def stop(self):
+        """Go offline and stop processing commands."""
+        self._unsub()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self.set_online(False)
+
+    def set_online(self, online):
+        """Publish the LWT, commands are lost while offline."""
+        self.online = online
+        self.broker.publish(
+            "tele/{}/LWT".format(self.name), "Online" if online else "Offline", retain=True
+        )
+
+    def _command_received(self, topic, payload):
+        self.stats["received"] += 1
+        if not self.online:
+            self.stats["offline"] += 1
+            return
+        self._queue.put_nowait(payload)
+
+    async def _run(self):
+        while True:
+            payload = await self._queue.get()
+            try:
+                command = json.loads(payload)
+            except ValueError:
+                self.broker.publish(
+                    "stat/{}/RESULT".format(self.name), json.dumps({"IRHVAC": "Invalid JSON"})
+                )
+                continue
+            self.busy = True
+            await asyncio.sleep(TRANSMIT_TIME.get(command.get("Vendor"), DEFAULT_TRANSMIT_TIME))
+            self.busy = False
+            self._apply(command)
+            self._publish_result()
+
+    def _apply(self, command):
+        for field, value in command.items():
+            if field not in IRHVAC_FIELDS:
+                continue
+            if isinstance(value, str) and field not in ("Vendor", "Mode"):
+                value = value.capitalize()
+            self.state[field] = value
+
+    def _publish_result(self):
+        """Answer like Tasmota: stat after sending, tele for the echo."""
+        if self._rng.random() < self._drop_rate:
+            self.stats["dropped"] += 1
+            return
+        stat = json.dumps({"IRHVAC": self.state})
+        tele = json.dumps({
+            "IrReceived": {
+                "Protocol": self.state["Vendor"],
+                "Bits": 128,
+                "Data": "0x{:032X}".format(self._rng.getrandbits(128)),
+                "Repeat": 0,
+                "IRHVAC": self.state,
+            }
+        })
+        copies = 1
+        if self._rng.random() < self._duplicate_rate:
+            self.stats["duplicated"] += 1
+            copies = 2
+        for _ in range(copies):
+            self.broker.publish("stat/{}/RESULT".format(self.name), stat)
+            self.broker.publish("tele/{}/RESULT".format(self.name), tele)
+            self.stats["sent"] += 1
+
+    def press_remote(self, **fields):
+        """Simulate the physical remote, only the receiver reports it."""
+        self._apply(fields)
+        self.broker.publish(
+            "tele/{}/RESULT".format(self.name),
+            json.dumps({"IrReceived": {"Protocol": self.state["Vendor"], "IRHVAC": self.state}}),
+        )
+
+
+async def flap(devices, rate, interval, rng, stop):
+    """Randomly take devices offline and back online."""
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        for device in devices:
+            if rng.random() < rate:
+                device.set_online(not device.online)
+
+
+async def run_load(broker, devices, commands, concurrency):
+    """Send commands to every device and measure the stat round trip."""
+    latencies = []
+    pending = {}
+
+    def result_received(topic, payload):
+        name = topic.split('/')[1]
+        started = pending.pop(name, None)
+        if started is not None:
+            latencies.append(time.monotonic() - started)
+
+    unsub = broker.subscribe("stat/+/RESULT", result_received)
+    modes = ["cool", "heat", "dry", "fan_only", "auto"]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def drive(device):
+        for index in range(commands):
+            async with semaphore:
+                pending[device.name] = time.monotonic()
+                broker.publish(device.command_topic, json.dumps({
+                    "Vendor": device.vendor,
+                    "Power": "on",
+                    "Mode": modes[index % len(modes)],
+                    "Temp": 18 + index % 10,
+                }))
+                deadline = time.monotonic() + 2
+                while device.name in pending and time.monotonic() < deadline:
+                    await asyncio.sleep(0.005)
+                pending.pop(device.name, None)
+
+    started = time.monotonic()
+    await asyncio.gather(*(drive(device) for device in devices))
+    elapsed = time.monotonic() - started
+    unsub()
+    return latencies, elapsed
+
+
+def main():
+    """Run the simulator from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--prefix", default="irsim")
+    parser.add_argument("--vendor", action="append",
+                        help="Vendor(s) to assign round robin, default all known")
+    parser.add_argument("--mqtt", help="Use the MQTT broker on this host instead of in process")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--commands", type=int, default=10, help="Commands per device")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--drop", type=float, default=0.0, help="Result drop rate")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="Result duplicate rate")
+    parser.add_argument("--flap", type=float, default=0.0,
+                        help="Chance per device and interval to toggle LWT")
+    parser.add_argument("--flap-interval", type=float, default=5.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--serve", action="store_true",
+                        help="Keep the devices running instead of generating load")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    broker = PahoBroker(args.mqtt, args.port) if args.mqtt else InProcessBroker()
+    rng = random.Random(args.seed)
+    vendors = args.vendor or sorted(TRANSMIT_TIME)
+    devices = [
+        VirtualTasmota(
+            broker, "{}{}".format(args.prefix, index), vendors[index % len(vendors)],
+            rng=rng, drop_rate=args.drop, duplicate_rate=args.duplicate,
+        )
+        for index in range(args.devices)
+    ]
+    for device in devices:
+        device.start()
+    stop = asyncio.Event()
+    flapper = None
+    if args.flap:
+        flapper = asyncio.ensure_future(flap(devices, args.flap, args.flap_interval, rng, stop))
+
+    try:
+        if args.serve:
+            print("Serving {} devices, press Ctrl+C to stop".format(len(devices)))
+            loop.run_forever()
+        else:
+            latencies, elapsed = loop.run_until_complete(
+                run_load(broker, devices, args.commands, args.concurrency)
+            )
+            sent = args.devices * args.commands
+            print("commands:   {} in {:.2f}s ({:.0f}/s)".format(sent, elapsed, sent / elapsed))
+            print("answered:   {}".format(len(latencies)))
+            if latencies:
+                latencies.sort()
+                print("latency ms: median {:.1f}  p95 {:.1f}  max {:.1f}".format(
+                    statistics.median(latencies) * 1000,
+                    latencies[int(len(latencies) * 0.95) - 1] * 1000,
+                    latencies[-1] * 1000,
+                ))
+            totals = {key: sum(device.stats[key] for device in devices) for key in devices[0].stats}
+            print("devices:    {}".format(totals))
+            print("published:  {}".format(broker.published))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if flapper is not None:
+            flapper.cancel()
+        loop.run_until_complete(asyncio.gather(*(device.stop() for device in devices)))
+        if isinstance(broker, PahoBroker):
+            broker.close()
+
+
+if __name__ == "__main__":
+    main()
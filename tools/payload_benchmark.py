@@ -0,0 +1,82 @@
+"""Compare the size and encode time of full, default-stripped and trimmed payloads.
+
+Default-stripped leaves out the fields at their Tasmota default for every
+vendor, trimmed sends the vendor profile and drops everything else the
+user did not set.
+
+    python tools/payload_benchmark.py [--number 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.tasmota_irhvac.payload import (  # noqa: E402
+    BASE_FIELDS,
+    TASMOTA_DEFAULTS,
+    VENDOR_FIELDS,
+    minimize_payload,
+)
+
+# What send_ir used to publish for every vendor, a unit with swing off and
+# the light and beep reported on by the remote
+FULL_PAYLOAD = {
+    "Model": "-1",
+    "Power": "on",
+    "Mode": "cool",
+    "Celsius": "on",
+    "Temp": 24,
+    "FanSpeed": "auto",
+    "SwingV": "off",
+    "SwingH": "off",
+    "Quiet": "off",
+    "Turbo": "off",
+    "Econo": "off",
+    "Light": "on",
+    "Filter": "off",
+    "Clean": "off",
+    "Beep": "on",
+    "Sleep": "-1",
+}
+
+
+def strip_defaults(payload):
+    """Leave out the fields at their Tasmota default, for every vendor alike."""
+    return {
+        field: value
+        for field, value in payload.items()
+        if field in BASE_FIELDS or str(value).lower() != TASMOTA_DEFAULTS.get(field)
+    }
+
+
+def main():
+    """Print payload size and encode time per vendor."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("{:<14} {:>6} {:>7} {:>6} {:>6} {:>9} {:>9}".format(
+        "vendor", "full B", "strip B", "trim B", "saved", "full us", "trim us"))
+    for vendor in sorted(VENDOR_FIELDS):
+        payload = dict(FULL_PAYLOAD, Vendor=vendor)
+        full = json.dumps(payload)
+        stripped = json.dumps(strip_defaults(payload))
+        trimmed = json.dumps(minimize_payload(payload))
+        full_time = timeit.timeit(lambda: json.dumps(payload), number=args.number)
+        trim_time = timeit.timeit(
+            lambda: json.dumps(minimize_payload(payload)), number=args.number)
+        print("{:<14} {:>6} {:>7} {:>6} {:>5.0f}% {:>9.2f} {:>9.2f}".format(
+            vendor,
+            len(full),
+            len(stripped),
+            len(trimmed),
+            100 * (1 - len(trimmed) / len(full)),
+            full_time / args.number * 1e6,
+            trim_time / args.number * 1e6,
+        ))
+
+if __name__ == "__main__":
+    main()